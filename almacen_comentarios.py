@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+from archivos import escribir_json_atomico
+
+# Almacén de comentarios en SQLite: cada comentario se inserta una sola vez gracias al
+# índice único (docente, hash), sin leer ni reescribir todo lo anterior. Cada lote va
+# en una transacción, así que un corte o dos recorridos a la vez no dejan datos a
+# medias. comentarios.json, que leen app.py y comentarios_a_csv_.py, se exporta desde
+# aquí con la misma forma de siempre.
+RUTA_ALMACEN = os.path.join("comentarios", "comentarios.db")
+RUTA_EXPORTACION = os.path.join("comentarios", "comentarios.json")
+
+def limpiar_comentario(comentario):
+    """Texto listo para guardar, o None si no es un comentario (vacío o en revisión)."""
+    texto = comentario.strip().lower()
+    if not texto or "comentario esperando revisión" in texto:
+        return None
+    return comentario.replace("\r", " ").replace("\n", " ").strip()
+
+def hash_comentario(texto):
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+class AlmacenComentarios:
+    def __init__(self, ruta=RUTA_ALMACEN):
+        self.ruta = ruta
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        nuevo = not os.path.exists(ruta)
+        self.conexion = sqlite3.connect(ruta, timeout=30)
+        self.conexion.execute("PRAGMA journal_mode=WAL")  # lectores sin bloquear al que escribe
+        with self.conexion:
+            self.conexion.execute("""
+                CREATE TABLE IF NOT EXISTS comentarios (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    docente TEXT NOT NULL,
+                    hash TEXT NOT NULL,
+                    texto TEXT NOT NULL,
+                    agregado TEXT NOT NULL
+                )""")
+            self.conexion.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_docente_hash ON comentarios (docente, hash)")
+        if nuevo and os.path.exists(RUTA_EXPORTACION) and ruta == RUTA_ALMACEN:
+            self.importar_json(RUTA_EXPORTACION)
+
+    def agregar_lote(self, comentarios_por_docente):
+        """
+        Inserta {docente: [comentarios]} en una sola transacción. Devuelve
+        {docente: (añadidos, omitidos)}; omitidos son los duplicados o en revisión.
+        """
+        ahora = datetime.now().isoformat(timespec='seconds')
+        resultado = {}
+        with self.conexion:
+            for docente, comentarios in comentarios_por_docente.items():
+                filas = []
+                for comentario in comentarios:
+                    texto = limpiar_comentario(comentario)
+                    if texto is not None:
+                        filas.append((docente, hash_comentario(texto), texto, ahora))
+                antes = self.conexion.total_changes
+                self.conexion.executemany(
+                    "INSERT OR IGNORE INTO comentarios (docente, hash, texto, agregado) VALUES (?, ?, ?, ?)",
+                    filas)
+                anadidos = self.conexion.total_changes - antes
+                resultado[docente] = (anadidos, len(comentarios) - anadidos)
+        return resultado
+
+    def agregar(self, docente, comentarios):
+        return self.agregar_lote({docente: comentarios})[docente]
+
+    def docentes(self):
+        return {fila[0] for fila in self.conexion.execute("SELECT DISTINCT docente FROM comentarios")}
+
+    def comentarios_por_docente(self):
+        datos = {}
+        for docente, texto in self.conexion.execute("SELECT docente, texto FROM comentarios ORDER BY id"):
+            datos.setdefault(docente, []).append(texto)
+        return datos
+
+    def exportar_json(self, ruta=RUTA_EXPORTACION):
+        """Escribe comentarios.json ({docente: {comentarios, total_comentarios}}) de forma atómica."""
+        data = {docente: {"comentarios": comentarios, "total_comentarios": len(comentarios)}
+                for docente, comentarios in self.comentarios_por_docente().items()}
+        escribir_json_atomico(ruta, data, indent=4)
+        return len(data)
+
+    def importar_json(self, ruta=RUTA_EXPORTACION):
+        """Carga un comentarios.json anterior al almacén (solo la primera vez que se crea)."""
+        try:
+            with open(ruta, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"[-] No se pudo importar {ruta}: {str(e)}")
+            return
+        self.agregar_lote({docente: datos.get("comentarios", []) for docente, datos in data.items()})
+        print(f"[+] {len(data)} docentes importados de {ruta}")
+
+    def cerrar(self):
+        self.conexion.close()
@@ -8,6 +8,7 @@ from datasets import Dataset
 import pandas as pd
 import re
 import unicodedata
+from instrumentacion import tramo
 
 MODEL_NAME = "dccuchile/bert-base-spanish-wwm-uncased"
 OUTPUT_DIR = "./modelo_entrenado"
@@ -63,10 +64,13 @@ if __name__ == "__main__":
         tokenizer=tokenizer,
     )
 
-    trainer.train()
+    with tramo("entrenamiento", ejemplos=len(dataset['train'])):
+        trainer.train()
 
     print("📊 Evaluando modelo...")
-    preds = trainer.predict(dataset['test'])
+    with tramo("evaluacion") as t:
+        preds = trainer.predict(dataset['test'])
+        t.contar("comentarios_clasificados", len(preds.label_ids))
     y_pred = preds.predictions.argmax(axis=1)
     y_true = preds.label_ids
     print(classification_report(y_true, y_pred, target_names=["negativo", "positivo"]))
@@ -5,6 +5,7 @@ import json
 import re
 import unicodedata
 from transformers import BertTokenizer, BertForSequenceClassification
+from instrumentacion import tramo
 
 MODEL_DIR = "./modelo_entrenado"
 
@@ -31,12 +32,14 @@ def clasificar_profesores(model, tokenizer):
 
     # Tokenizar comentarios limpios
     textos = df['comentarios_limpios'].tolist()
-    tokens = tokenizer(textos, padding=True, truncation=True, return_tensors="pt")
+    with tramo("tokenizacion", comentarios=len(textos)):
+        tokens = tokenizer(textos, padding=True, truncation=True, return_tensors="pt")
 
     # Realizar predicciones sin gradiente (modo inferencia)
-    with torch.no_grad():
+    with tramo("inferencia") as t, torch.no_grad():
         outputs = model(**tokens)
         preds = torch.argmax(outputs.logits, dim=1).numpy()
+        t.contar("comentarios_clasificados", len(preds))
 
     # Añadir columna de sentimiento según predicción
     df['sentimiento'] = ['positivo' if p == 1 else 'negativo' for p in preds]
@@ -68,6 +71,7 @@ def clasificar_profesores(model, tokenizer):
     print("Clasificación generada en 'clasificacion_profesores.json'")
 
 if __name__ == "__main__":
-    tokenizer = BertTokenizer.from_pretrained(MODEL_DIR)
-    model = BertForSequenceClassification.from_pretrained(MODEL_DIR)
+    with tramo("modelo.carga"):
+        tokenizer = BertTokenizer.from_pretrained(MODEL_DIR)
+        model = BertForSequenceClassification.from_pretrained(MODEL_DIR)
     clasificar_profesores(model, tokenizer)
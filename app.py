@@ -1,6 +1,9 @@
 import streamlit as st
-from main import abrir_login_y_guardar_captcha, login_and_navigate, run_horario_scraper
+from main import (abrir_login_y_guardar_captcha, login_and_navigate, run_horario_scraper,
+                  pool_navegadores, liberar_driver)
 from styles import load_custom_css, render_metric_card, render_comentario_card, render_profesor_title
+from instrumentacion import nueva_corrida, fijar_corrida, entorno_con_corrida, leer_metricas, resumir
+from coincidencia_nombres import IndiceNombres
 import os
 from pdf2image import convert_from_path
 import pandas as pd
@@ -11,6 +14,15 @@ import sys
 # Cargar estilos CSS al inicio
 load_custom_css()
 
+@st.cache_resource
+def iniciar_pool_navegadores():
+    """Abre los navegadores del pool una sola vez por proceso, sin bloquear la página."""
+    pool = pool_navegadores()
+    pool.calentar(en_segundo_plano=True)
+    return pool
+
+iniciar_pool_navegadores()
+
 st.title("Generador de Horarios UPAO")
 
 # Inicializar estados de sesión al principio
@@ -28,6 +40,50 @@ if "clasificaciones_procesadas" not in st.session_state:
     st.session_state.clasificaciones_procesadas = False
 if "mostrar_clasificaciones" not in st.session_state:
     st.session_state.mostrar_clasificaciones = False
+if "corrida" not in st.session_state:
+    st.session_state.corrida = None
+# Cada ejecución del script registra sus tramos en la corrida de su propia sesión
+fijar_corrida(st.session_state.corrida)
+
+DIAS_SEMANA = {'LUN': 'Lunes', 'MAR': 'Martes', 'MIE': 'Miércoles',
+               'JUE': 'Jueves', 'VIE': 'Viernes', 'SAB': 'Sábado'}
+
+def construir_restricciones(dias_excluidos, hora_minima, hora_maxima,
+                            docentes_excluidos, docentes_preferidos, max_dias):
+    """Arma el diccionario de preferencias que entiende run_horario_scraper"""
+    def separar(texto):
+        # Un docente por línea (o separados por ";"): la coma es parte del nombre, "PEREZ DIAZ, JUAN"
+        return [nombre.strip() for linea in texto.splitlines() for nombre in linea.split(";") if nombre.strip()]
+
+    restricciones = {
+        'dias_excluidos': dias_excluidos,
+        'hora_minima': hora_minima,
+        'hora_maxima': hora_maxima,
+        'docentes_excluidos': separar(docentes_excluidos),
+        'docentes_preferidos': separar(docentes_preferidos),
+        'max_dias': int(max_dias) or None,
+    }
+    return {clave: valor for clave, valor in restricciones.items() if valor}
+
+def entorno_corrida():
+    """Entorno para los subprocesos: sus métricas quedan en la corrida de esta sesión."""
+    return entorno_con_corrida(st.session_state.corrida)
+
+def show_metricas_corrida():
+    registros = leer_metricas(corrida=st.session_state.corrida)
+    if not registros:
+        st.info("Todavía no hay métricas registradas para esta sesión.")
+        return
+    total = sum(r["segundos"] for r in registros if r.get("padre") is None)
+    crecimiento = sum((r.get("rss_crecimiento_kb") or 0) for r in registros if r.get("padre") is None) / 1024
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Tiempo medido", f"{total:.1f} s")
+    with col2:
+        st.metric("Memoria añadida al pico del proceso", f"{crecimiento:.0f} MB",
+                  help="El servidor atiende a todas las sesiones en un solo proceso; "
+                       "esto es cuánto subió su pico de memoria durante esta sesión.")
+    st.dataframe(resumir(registros), use_container_width=True, hide_index=True)
 
 # Funciones para las opiniones de profesores
 def ejecutar_scraping_comentarios():
@@ -36,7 +92,7 @@ def ejecutar_scraping_comentarios():
         print("Ejecutando main_comentarios.py...")  # Debug
         # Ejecutar el script main_comentarios.py
         result = subprocess.run([sys.executable, "main_comentarios.py"], 
-                              capture_output=True, text=True, cwd=".")
+                              capture_output=True, text=True, cwd=".", env=entorno_corrida())
         
         print(f"Return code: {result.returncode}")  # Debug
         print(f"Stdout: {result.stdout}")  # Debug
@@ -56,7 +112,7 @@ def ejecutar_clasificacion_profesores():
         # Paso 1: Ejecutar comentarios_a_csv_.py
         print("Ejecutando comentarios_a_csv_.py...")
         result1 = subprocess.run([sys.executable, "comentarios/comentarios_a_csv_.py"], 
-                               capture_output=True, text=True, cwd=".")
+                               capture_output=True, text=True, cwd=".", env=entorno_corrida())
         
         if result1.returncode != 0:
             return False, f"Error en comentarios_a_csv_.py: {result1.stderr}"
@@ -64,7 +120,7 @@ def ejecutar_clasificacion_profesores():
         # Paso 2: Ejecutar aplicacion-analisis-sent.py
         print("Ejecutando aplicacion-analisis-sent.py...")
         result2 = subprocess.run([sys.executable, "aplicacion-analisis-sent.py"], 
-                               capture_output=True, text=True, cwd=".")
+                               capture_output=True, text=True, cwd=".", env=entorno_corrida())
         
         if result2.returncode != 0:
             return False, f"Error en aplicacion-analisis-sent.py: {result2.stderr}"
@@ -135,13 +191,30 @@ def show_profesor_classifications():
         for _, profesor in profesores_malos.iterrows():
             st.error(f"👨‍🏫 {profesor['Docente']}")
 
-def load_profesor_comments():
-    """Carga los comentarios de profesores desde el archivo JSON"""
+RUTA_COMENTARIOS = 'comentarios/comentarios.json'
+
+def version_comentarios():
+    """Cambia cada vez que se reescribe comentarios.json; sirve de clave para las cachés."""
     try:
-        with open('comentarios/comentarios.json', 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
+        return os.path.getmtime(RUTA_COMENTARIOS)
+    except OSError:
+        return None
+
+@st.cache_data
+def cargar_comentarios(version):
+    if version is None:
         return {}
+    with open(RUTA_COMENTARIOS, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+@st.cache_resource
+def indice_comentarios(version):
+    """Índice de nombres de comentarios.json, construido una vez por versión del archivo."""
+    return IndiceNombres(cargar_comentarios(version))
+
+def load_profesor_comments():
+    """Carga los comentarios de profesores desde el archivo JSON"""
+    return cargar_comentarios(version_comentarios())
 
 def get_profesores_from_horarios():
     """Obtiene la lista de profesores únicos de los horarios válidos"""
@@ -156,23 +229,12 @@ def get_profesores_from_horarios():
 
 def show_profesor_comments(profesor_nombre):
     """Muestra los comentarios de un profesor específico"""
-    comentarios_data = load_profesor_comments()
-    
-    # Función para normalizar nombres para búsqueda
-    def normalizar_nombre_comentarios(nombre):
-        return set(palabra.upper().strip() for palabra in nombre.split() if palabra.strip())
+    version = version_comentarios()
+    comentarios_data = cargar_comentarios(version)
     
     # Buscar comentarios del profesor
-    profesor_normalizado = normalizar_nombre_comentarios(profesor_nombre)
-    comentarios_encontrados = None
-    nombre_encontrado = None
-    
-    for prof_comentarios, data in comentarios_data.items():
-        prof_normalizado = normalizar_nombre_comentarios(prof_comentarios)
-        if profesor_normalizado == prof_normalizado:
-            comentarios_encontrados = data
-            nombre_encontrado = prof_comentarios
-            break
+    nombre_encontrado = indice_comentarios(version).buscar(profesor_nombre)
+    comentarios_encontrados = comentarios_data.get(nombre_encontrado) if nombre_encontrado else None
     
     if comentarios_encontrados:
         st.markdown(render_profesor_title(nombre_encontrado), unsafe_allow_html=True)
@@ -191,35 +253,26 @@ def show_profesor_opinions():
     st.subheader("📝 Opiniones acerca de tus profesores")
     
     # Cargar comentarios y profesores de horarios
-    comentarios_data = load_profesor_comments()
+    version = version_comentarios()
+    comentarios_data = cargar_comentarios(version)
     profesores_horarios = get_profesores_from_horarios()
     
     if len(comentarios_data) == 0 or len(profesores_horarios) == 0:
         st.warning("No hay datos de comentarios disponibles para mostrar")
         return
     
-    # Función para normalizar nombres (convertir a conjunto de palabras en mayúsculas)
-    def normalizar_nombre(nombre):
-        return set(palabra.upper().strip() for palabra in nombre.split() if palabra.strip())
-    
     # Filtrar solo los profesores que están en los horarios válidos y tienen comentarios
+    indice = indice_comentarios(version)
     profesores_con_comentarios = []
     
     for profesor in profesores_horarios:
-        profesor_normalizado = normalizar_nombre(profesor)
-        
-        # Buscar coincidencia en comentarios
-        for prof_comentarios, data in comentarios_data.items():
-            prof_normalizado = normalizar_nombre(prof_comentarios)
-            
-            # Si hay coincidencia exacta de todas las palabras
-            if profesor_normalizado == prof_normalizado:
-                profesores_con_comentarios.append({
-                    'Docente': profesor,  # Usar el nombre del CSV
-                    'Total_Comentarios': data['total_comentarios'],
-                    'Nombre_Comentarios': prof_comentarios
-                })
-                break
+        prof_comentarios = indice.buscar(profesor)
+        if prof_comentarios:
+            profesores_con_comentarios.append({
+                'Docente': profesor,  # Usar el nombre del CSV
+                'Total_Comentarios': comentarios_data[prof_comentarios]['total_comentarios'],
+                'Nombre_Comentarios': prof_comentarios
+            })
     
     if len(profesores_con_comentarios) == 0:
         st.warning("No se encontraron comentarios para los profesores de tus horarios")
@@ -257,8 +310,17 @@ if st.session_state.pantalla == "login":
         user = st.text_input("Usuario UPAO")
         password = st.text_input("Contraseña", type="password")
         curso_ids = st.text_input("IDs de cursos (ej: ISIA-109,ISIA-110)")
-        base_url = st.text_input("URL de login", value="https://matricula.upao.edu.pe/login")
-        base_horarios = st.text_input("URL de horarios", value="https://matricula.upao.edu.pe/horarios")
+        base_url = st.text_input("URL de login", value=os.getenv("BASE_URL", "https://matricula.upao.edu.pe/login"))
+        base_horarios = st.text_input("URL de horarios", value=os.getenv("BASE_HORARIOS", "https://matricula.upao.edu.pe/horarios"))
+        with st.expander("Preferencias de horario (opcional)"):
+            dias_excluidos = st.multiselect("Días sin clases", list(DIAS_SEMANA), format_func=DIAS_SEMANA.get)
+            hora_minima = st.time_input("No empezar antes de", value=None)
+            hora_maxima = st.time_input("No terminar después de", value=None)
+            docentes_excluidos = st.text_area("Docentes a evitar (uno por línea)",
+                                              help="Como aparece en el horario, p. ej. PEREZ DIAZ, JUAN CARLOS; "
+                                                   "basta con apellidos y nombre, sin importar tildes ni orden.")
+            docentes_preferidos = st.text_area("Docentes preferidos (uno por línea)")
+            max_dias = st.number_input("Máximo de días con clases (0 = sin límite)", min_value=0, max_value=6, value=0)
         step = st.radio("Paso", ["1. Ingresar credenciales y obtener captcha", "2. Ingresar captcha y continuar scraping"])
         captcha_code = st.text_input("Captcha (solo en paso 2)", value="") if step == "2. Ingresar captcha y continuar scraping" else ""
         submitted = st.form_submit_button("Siguiente")
@@ -268,40 +330,55 @@ if st.session_state.pantalla == "login":
             if not user or not password or not curso_ids:
                 st.error("Por favor, completa todos los campos.")
             else:
+                captcha_path = None
                 with st.spinner("Abriendo navegador y obteniendo captcha..."):
-                    driver, captcha_path = abrir_login_y_guardar_captcha(user, password, base_url)
-                    st.session_state.driver = driver
-                    st.session_state.curso_ids = curso_ids
-                    st.session_state.base_url = base_url
-                    st.session_state.base_horarios = base_horarios
-                st.image(captcha_path, caption="Captcha actual")
-                st.success("Captcha obtenido. Ahora ingresa el código y pasa al paso 2.")
+                    liberar_driver(st.session_state.driver)  # captcha pedido antes y no usado
+                    st.session_state.driver = None
+                    st.session_state.corrida = nueva_corrida()
+                    try:
+                        driver, captcha_path = abrir_login_y_guardar_captcha(user, password, base_url)
+                        st.session_state.driver = driver
+                        st.session_state.curso_ids = curso_ids
+                        st.session_state.base_url = base_url
+                        st.session_state.base_horarios = base_horarios
+                    except Exception as e:
+                        st.error(f"No se pudo abrir la página de login: {e}")
+                if captcha_path:
+                    st.image(captcha_path, caption="Captcha actual")
+                    st.success("Captcha obtenido. Ahora ingresa el código y pasa al paso 2.")
         elif step == "2. Ingresar captcha y continuar scraping":
             if not captcha_code or st.session_state.driver is None:
                 st.error("Debes obtener el captcha primero (paso 1).")
             else:
                 with st.spinner("Procesando scraping..."):
+                    # Desde aquí el navegador es de esta corrida: se libera una sola vez, o aquí si
+                    # falla el login, o en run_horario_scraper al terminar
+                    driver = st.session_state.driver
+                    st.session_state.driver = None
                     try:
-                        driver = login_and_navigate(st.session_state.driver, captcha_code, st.session_state.base_horarios)
+                        driver = login_and_navigate(driver, captcha_code, st.session_state.base_horarios)
+                    except Exception as e:
+                        liberar_driver(driver)
+                        driver = None
+                        st.error(f"Error en el login: {e}")
+                    if driver is not None:
                         ok, msg = run_horario_scraper(
                             user,
                             password,
                             [c.strip().upper() for c in st.session_state.curso_ids.split(",")],
                             st.session_state.base_url,
                             st.session_state.base_horarios,
-                            driver=driver
+                            driver=driver,
+                            restricciones=construir_restricciones(
+                                dias_excluidos, hora_minima, hora_maxima,
+                                docentes_excluidos, docentes_preferidos, max_dias
+                            )
                         )
                         if ok:
                             st.success(msg)
                             st.session_state.pantalla = "final"
                         else:
                             st.error(msg)
-                    except Exception as e:
-                        st.error(f"Error: {e}")
-                    finally:
-                        if st.session_state.driver:
-                            st.session_state.driver.quit()
-                        st.session_state.driver = None
 
 elif st.session_state.pantalla == "final":
     pdf_folder = "horarios_generados"
@@ -362,6 +439,9 @@ elif st.session_state.pantalla == "final":
         if st.session_state.mostrar_clasificaciones:
             show_profesor_classifications()
     
+    with st.expander("⏱️ Tiempos y recursos de esta sesión"):
+        show_metricas_corrida()
+
     # Separador visual
     st.markdown("---")
     
@@ -400,11 +480,13 @@ elif st.session_state.pantalla == "final":
                 print(f"[ERROR] Error al eliminar datacoment.csv: {e}")
 
             try:
-                if os.path.exists("./comentarios/comentarios.json"):
-                    os.remove("./comentarios/comentarios.json")
-                    print("[INFO] Se eliminó comentarios.json")
+                for ruta in ("./comentarios/comentarios.json", "./comentarios/comentarios.db",
+                             "./comentarios/comentarios.db-wal", "./comentarios/comentarios.db-shm"):
+                    if os.path.exists(ruta):
+                        os.remove(ruta)
+                        print(f"[INFO] Se eliminó {os.path.basename(ruta)}")
             except Exception as e:
-                print(f"[ERROR] Error al eliminar comentarios.json: {e}")
+                print(f"[ERROR] Error al eliminar los comentarios guardados: {e}")
 
             # Limpiar archivos JSON de la carpeta data-horarios
             try:
@@ -0,0 +1,74 @@
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+# Escritura atómica de JSON: se escribe en un temporal único de la misma carpeta y se
+# reemplaza el destino de una vez. Un corte a mitad no deja un archivo a medias, y dos
+# procesos que escriben el mismo archivo a la vez no comparten el temporal (gana el
+# último os.replace). Para archivos que varios procesos van completando (índices,
+# cachés), actualizar_json_atomico relee y mezcla bajo un cerrojo entre procesos, así
+# ninguno pisa con su copia vieja lo que otro acaba de escribir.
+
+def escribir_json_atomico(ruta, datos, indent=2):
+    carpeta = os.path.dirname(ruta) or "."
+    os.makedirs(carpeta, exist_ok=True)
+    descriptor, temporal = tempfile.mkstemp(dir=carpeta, prefix=os.path.basename(ruta) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "w", encoding="utf-8") as f:
+            json.dump(datos, f, ensure_ascii=False, indent=indent)
+        os.replace(temporal, ruta)
+    except BaseException:
+        try:
+            os.remove(temporal)
+        except OSError:
+            pass
+        raise
+
+@contextmanager
+def bloqueo_archivo(ruta):
+    """Cerrojo exclusivo entre procesos (y entre hilos) sobre `ruta`.lock."""
+    carpeta = os.path.dirname(ruta) or "."
+    os.makedirs(carpeta, exist_ok=True)
+    with open(ruta + ".lock", "a+b") as f:
+        if os.name == "nt":
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)  # reintenta 10 s y luego falla
+                    break
+                except OSError:
+                    continue
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+def actualizar_json_atomico(ruta, actualizar, indent=2):
+    """
+    Relee el diccionario de `ruta` bajo el cerrojo, le aplica actualizar(datos) y lo
+    reescribe de forma atómica. Devuelve lo escrito, que incluye lo que hayan guardado
+    otros procesos.
+    """
+    with bloqueo_archivo(ruta):
+        datos = {}
+        if os.path.exists(ruta):
+            try:
+                with open(ruta, "r", encoding="utf-8") as f:
+                    datos = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"[-] {ruta} ilegible, se reescribe: {str(e)}")
+        actualizar(datos)
+        escribir_json_atomico(ruta, datos, indent)
+    return datos
@@ -0,0 +1,197 @@
+import argparse
+import glob
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from itertools import islice
+
+from main import (agrupar_opciones_por_curso, aplanar_combinacion, construir_indice_conflictos,
+                  contar_combinaciones, contar_horarios_validos, is_horario_valido,
+                  iterar_combinaciones_todos_cursos, resolver_horarios, resolver_horarios_paralelo,
+                  resolver_mejores_horarios)
+from secciones import Seccion
+
+# Benchmark del motor de horarios sin entrar al portal: genera un catálogo sintético
+# con el mismo formato que data-horarios/*.json y mide cada motor con él.
+#
+#   python benchmark_horarios.py                          # todos los escenarios
+#   python benchmark_horarios.py --escenario mediano --salida base.json
+#   python benchmark_horarios.py --comparar base.json     # falla si algo empeora
+#   python benchmark_horarios.py --datos data-horarios    # catálogo real guardado
+#   python benchmark_horarios.py --exportar sinteticos    # escribe los JSON sintéticos
+
+DIAS = ['LUN', 'MAR', 'MIE', 'JUE', 'VIE', 'SAB']
+PRIMERA_HORA = 7
+BLOQUES_POR_DIA = 7  # bloques de 2 horas entre las 7:00 y las 21:00
+SESIONES_POR_TIPO = {'T': 2, 'P': 1, 'L': 1}
+
+ESCENARIOS = {
+    'pequeño': dict(cursos=4, ligas=2, tipos='TP', secciones_por_tipo=2, densidad=0.2),
+    'mediano': dict(cursos=6, ligas=3, tipos='TPL', secciones_por_tipo=2, densidad=0.3),
+    'grande': dict(cursos=7, ligas=4, tipos='TPL', secciones_por_tipo=2, densidad=0.15),
+}
+
+# La fuerza bruta recorre todo el producto cartesiano: solo se mide si es pequeño
+MAX_COMBINACIONES_FUERZA_BRUTA = 2_000_000
+LIMITE = 10_000
+K_MEJORES = 100
+TOLERANCIA = 0.25
+
+def generar_catalogo(cursos=6, ligas=3, tipos='TPL', secciones_por_tipo=2, densidad=0.3, semilla=0):
+    """
+    Genera secciones sintéticas con el formato de data-horarios/*.json. Las sesiones
+    caen en bloques de 2 horas; las teorías tienen dos por semana y el resto una.
+    `densidad` (0 a 1) quita bloques disponibles al día: con más densidad hay más
+    cruces y menos horarios válidos. La misma semilla da el mismo catálogo.
+    """
+    rnd = random.Random(semilla)
+    bloques = max(1, round(BLOQUES_POR_DIA * (1 - densidad)))
+    secciones = []
+    for c in range(cursos):
+        curso = f"SINT-{100 + c}"
+        for liga in range(1, ligas + 1):
+            for tipo in tipos:
+                for k in range(secciones_por_tipo):
+                    horarios = []
+                    for dia in rnd.sample(DIAS, SESIONES_POR_TIPO.get(tipo, 1)):
+                        inicio = (PRIMERA_HORA + 2 * rnd.randrange(bloques)) * 60
+                        fin = inicio + rnd.choice([90, 120])
+                        horarios.append({
+                            'dia': dia,
+                            'hora_inicio': f"{inicio // 60:02d}:{inicio % 60:02d}:00",
+                            'hora_fin': f"{fin // 60:02d}:{fin % 60:02d}:00"
+                        })
+                    secciones.append({
+                        'curso': curso,
+                        'nrc': f"{c}{liga:02d}{tipo}{k}",
+                        'id_liga': f"{tipo}{liga}",
+                        'docente': f"DOCENTE {c}{tipo}{k % 2}",
+                        'horarios': horarios
+                    })
+    return secciones
+
+def guardar_catalogo(secciones, carpeta):
+    """Escribe un JSON por curso, igual que run_horario_scraper en data-horarios."""
+    os.makedirs(carpeta, exist_ok=True)
+    por_curso = {}
+    for sec in secciones:
+        por_curso.setdefault(sec['curso'], []).append(sec)
+    for curso, datos in por_curso.items():
+        with open(os.path.join(carpeta, f"{curso}.json"), "w", encoding="utf-8") as f:
+            json.dump(datos, f, ensure_ascii=False, indent=2)
+
+def cargar_catalogo(carpeta):
+    secciones = []
+    for archivo in sorted(glob.glob(os.path.join(carpeta, "*.json"))):
+        with open(archivo, 'r', encoding='utf-8') as f:
+            secciones.extend(json.load(f))
+    return secciones
+
+def _fuerza_bruta(secciones):
+    return (comb for comb in iterar_combinaciones_todos_cursos(secciones)
+            if is_horario_valido(aplanar_combinacion(comb)))
+
+def motores(secciones, procesos):
+    """Cada motor es una función sin argumentos que devuelve un iterable de resultados."""
+    indice = construir_indice_conflictos(agrupar_opciones_por_curso(secciones))
+    lista = {
+        'backtracking': lambda: islice(resolver_horarios(secciones, indice), LIMITE),
+        'paralelo': lambda: resolver_horarios_paralelo(secciones, LIMITE, procesos, indice),
+        'mejores': lambda: resolver_mejores_horarios(secciones, K_MEJORES, procesos, indice),
+        'conteo': lambda: [contar_horarios_validos(secciones, indice)],
+    }
+    if contar_combinaciones(agrupar_opciones_por_curso(secciones)) <= MAX_COMBINACIONES_FUERZA_BRUTA:
+        lista['fuerza_bruta'] = lambda: islice(_fuerza_bruta(secciones), LIMITE)
+    return lista
+
+def _recorrer(fabrica):
+    inicio = time.perf_counter()
+    primero = None
+    cantidad = 0
+    for _ in fabrica():
+        if primero is None:
+            primero = time.perf_counter() - inicio
+        cantidad += 1
+    return cantidad, time.perf_counter() - inicio, primero
+
+def medir(fabrica):
+    """
+    Mide un motor en dos pasadas: una sin tracemalloc para el tiempo y otra con
+    tracemalloc para el pico de memoria (que solo cuenta el proceso principal).
+    """
+    cantidad, segundos, primero = _recorrer(fabrica)
+    tracemalloc.start()
+    try:
+        _recorrer(fabrica)
+        pico = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        'resultados': cantidad,
+        'segundos': round(segundos, 4),
+        'por_segundo': round(cantidad / segundos, 1) if segundos else None,
+        'primer_resultado': round(primero, 4) if primero is not None else None,
+        'pico_memoria_kb': round(pico / 1024, 1)
+    }
+
+def ejecutar(escenarios, procesos, datos=None):
+    catalogos = {'datos': cargar_catalogo(datos)} if datos else {
+        nombre: generar_catalogo(**ESCENARIOS[nombre]) for nombre in escenarios}
+    resultados = {}
+    for nombre, crudo in catalogos.items():
+        secciones = [Seccion.desde_dict(sec) for sec in crudo]
+        print(f"\n[+] Escenario {nombre}: {len(secciones)} secciones, "
+              f"{contar_combinaciones(agrupar_opciones_por_curso(secciones))} combinaciones")
+        for motor, fabrica in motores(secciones, procesos).items():
+            r = medir(fabrica)
+            resultados[f"{nombre}/{motor}"] = r
+            print(f"[+]   {motor:<13} {r['resultados']:>7} resultados  {r['segundos']:>9.4f} s  "
+                  f"{r['por_segundo'] or 0:>11.1f}/s  primero {r['primer_resultado'] or 0:.4f} s  "
+                  f"pico {r['pico_memoria_kb']:.1f} KB")
+    return resultados
+
+def comparar(actual, anterior, tolerancia=TOLERANCIA):
+    """Lista de regresiones: tiempo o memoria que empeoran más que `tolerancia`."""
+    regresiones = []
+    for clave, r in actual.items():
+        base = anterior.get(clave)
+        if not base:
+            continue
+        for campo in ('segundos', 'pico_memoria_kb'):
+            if base[campo] and r[campo] > base[campo] * (1 + tolerancia):
+                regresiones.append(f"{clave} {campo}: {base[campo]} -> {r[campo]}")
+    return regresiones
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del motor de horarios")
+    parser.add_argument("--escenario", choices=list(ESCENARIOS), action="append",
+                        help="escenario a medir (se puede repetir); por defecto todos")
+    parser.add_argument("--datos", help="carpeta con JSON de secciones en vez del catálogo sintético")
+    parser.add_argument("--procesos", type=int, default=2)
+    parser.add_argument("--salida", help="guarda los resultados en este JSON")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior para detectar regresiones")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA)
+    parser.add_argument("--exportar", help="guarda los catálogos sintéticos como JSON en esta carpeta")
+    args = parser.parse_args()
+
+    if args.exportar:
+        for nombre in args.escenario or list(ESCENARIOS):
+            guardar_catalogo(generar_catalogo(**ESCENARIOS[nombre]), os.path.join(args.exportar, nombre))
+        print(f"[+] Catálogos sintéticos guardados en {args.exportar}")
+
+    resultados = ejecutar(args.escenario or list(ESCENARIOS), args.procesos, args.datos)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+        print(f"[+] Resultados guardados en {args.salida}")
+    if args.comparar:
+        with open(args.comparar, 'r', encoding='utf-8') as f:
+            regresiones = comparar(resultados, json.load(f), args.tolerancia)
+        for regresion in regresiones:
+            print(f"[-] Regresión: {regresion}")
+        if regresiones:
+            sys.exit(1)
+        print("[+] Sin regresiones")
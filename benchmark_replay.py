@@ -0,0 +1,127 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+
+# Corrida de punta a punta contra el servidor local de replay/ (sin tocar el portal
+# ni misprofesores.com), con el tiempo de cada fase:
+#
+#   python benchmark_replay.py --escenario mediano --latencia 0.1 --salida replay.json
+#
+# Las fases con navegador se omiten si no hay Chrome disponible; la descarga de
+# detalles por HTTP y la paginación de comentarios no lo necesitan.
+
+def _configurar_entorno(base, sin_limite):
+    os.environ["BASE_URL"] = f"{base}/"
+    os.environ["BASE_HORARIOS"] = f"{base}/horarios"
+    os.environ["MISPROFESORES_URL"] = base
+    os.environ["HORARIOS_CACHE_TTL"] = "0"  # medir la descarga, no la caché
+    import main
+    import main_comentarios
+    main_comentarios.MISPROFESORES_URL = base
+    if sin_limite:
+        for limitador in (main.limitador_portal, main_comentarios.limitador_misprofesores):
+            limitador.tasa_base = limitador.tasa = 1000.0
+
+class Fases:
+    def __init__(self):
+        self.tiempos = {}
+
+    def medir(self, nombre, funcion, *args, **kwargs):
+        print(f"\n[+] Fase: {nombre}")
+        inicio = time.perf_counter()
+        try:
+            resultado = funcion(*args, **kwargs)
+        except Exception as e:
+            self.tiempos[nombre] = None
+            print(f"[-] Fase {nombre} omitida: {str(e)}")
+            return None
+        self.tiempos[nombre] = round(time.perf_counter() - inicio, 4)
+        return resultado
+
+    def resumen(self):
+        print("\n[+] Tiempo por fase")
+        for nombre, segundos in self.tiempos.items():
+            print(f"[+]   {nombre:<28} {'omitida' if segundos is None else f'{segundos:.3f} s'}")
+
+def _login_http(base):
+    """Sesión HTTP autenticada contra el replay, para las fases que no usan navegador."""
+    import requests
+    sesion = requests.Session()
+    sesion.post(f"{base}/login", data={"usuario": "replay", "clave": "replay", "captcha": "0000"})
+    return sesion
+
+def _detalles_http(base, sesion, curso_ids):
+    from concurrent.futures import ThreadPoolExecutor
+    from main import DETALLE_CURSOS_CONCURRENCIA, descargar_detalle_curso
+    from replay.servidor import PERIODO
+    with ThreadPoolExecutor(max_workers=DETALLE_CURSOS_CONCURRENCIA) as executor:
+        resultados = list(executor.map(
+            lambda c: descargar_detalle_curso(sesion, f"{base}/detalle_cursos", ["p_curso", "p_periodo"],
+                                              [c, PERIODO], c),
+            curso_ids))
+    print(f"[+] {sum(map(len, resultados))} secciones de {len(curso_ids)} cursos")
+    return resultados
+
+def _login_navegador(base):
+    from main import abrir_login_y_guardar_captcha, login_and_navigate
+    driver, _ = abrir_login_y_guardar_captcha("replay", "replay", f"{base}/")
+    return login_and_navigate(driver, "0000", f"{base}/horarios")
+
+def _perfiles(docentes):
+    from main_comentarios import buscar_url_perfil
+    return [url for url, _ in (buscar_url_perfil(d, None) for d in docentes) if url]
+
+def _docentes_en_paralelo(docentes):
+    from main_comentarios import recorrer_docentes
+    recorrer_docentes(docentes, {})
+
+def _comentarios(urls):
+    from main_comentarios import extraer_comentarios_con_paginacion
+    total = sum(len(extraer_comentarios_con_paginacion(url, {})) for url in urls)
+    print(f"[+] {total} comentarios en {len(urls)} perfiles")
+    return total
+
+def ejecutar(escenario, latencia, sin_limite=True, con_navegador=True):
+    from replay.servidor import iniciar_servidor
+    servidor, base, datos = iniciar_servidor(0, escenario, latencia)
+    _configurar_entorno(base, sin_limite)
+    curso_ids = sorted(datos.por_curso)
+    docentes = [docente for docente, _ in datos.comentarios.values()]
+    fases = Fases()
+    try:
+        sesion = fases.medir("login http", _login_http, base)
+        fases.medir("detalles http", _detalles_http, base, sesion, curso_ids)
+        if con_navegador:
+            from main import run_horario_scraper
+            driver = fases.medir("login navegador", _login_navegador, base)
+            if driver:
+                fases.medir("horarios (navegador + motor)", run_horario_scraper,
+                            "replay", "replay", curso_ids, f"{base}/", f"{base}/horarios", driver)
+            fases.medir("búsqueda de perfiles", _perfiles, docentes)
+            fases.medir("docentes en paralelo", _docentes_en_paralelo, docentes)
+        urls = [f"{base}/profesores/{slug}" for slug in datos.comentarios]
+        fases.medir("comentarios paginados", _comentarios, urls)
+    finally:
+        servidor.shutdown()
+    fases.resumen()
+    return fases.tiempos
+
+if __name__ == "__main__":
+    from benchmark_horarios import ESCENARIOS
+    parser = argparse.ArgumentParser(description="Benchmark de punta a punta contra el servidor de replay")
+    parser.add_argument("--escenario", choices=list(ESCENARIOS), default="mediano")
+    parser.add_argument("--latencia", type=float, default=0.0, help="segundos añadidos a cada respuesta")
+    parser.add_argument("--con-limite", action="store_true", help="respetar las tasas del limitador")
+    parser.add_argument("--sin-navegador", action="store_true", help="solo las fases HTTP")
+    parser.add_argument("--salida", help="guarda los tiempos por fase en este JSON")
+    args = parser.parse_args()
+
+    salida = os.path.abspath(args.salida) if args.salida else None
+    os.chdir(tempfile.mkdtemp(prefix="replay-"))  # PDFs, CSV y JSON fuera del repositorio
+    tiempos = ejecutar(args.escenario, args.latencia, not args.con_limite, not args.sin_navegador)
+    if salida:
+        with open(salida, "w", encoding="utf-8") as f:
+            json.dump(tiempos, f, ensure_ascii=False, indent=2)
+        print(f"[+] Tiempos guardados en {salida}")
@@ -0,0 +1,85 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+
+from archivos import escribir_json_atomico, actualizar_json_atomico
+from secciones import Seccion
+
+# Caché persistente de secciones por curso, separada de data-horarios (que solo guarda
+# los cursos de la sesión actual). Cada curso se guarda en {carpeta}/{curso_id}.json y
+# el índice registra cuándo se descargó, cuándo cambió por última vez y el hash del
+# contenido; un archivo que no coincide con su hash se descarta. Cada guardado relee el
+# índice bajo un cerrojo, así dos sesiones a la vez no se borran las entradas.
+CACHE_FOLDER = "cache-horarios"
+TTL_POR_DEFECTO = 12 * 60 * 60  # segundos
+
+def hash_secciones(datos):
+    """Hash estable de una lista de secciones en formato JSON (dicts)."""
+    canonico = json.dumps(datos, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonico.encode('utf-8')).hexdigest()
+
+class CacheSecciones:
+    def __init__(self, carpeta=CACHE_FOLDER, ttl=None):
+        self.carpeta = carpeta
+        self.ttl = TTL_POR_DEFECTO if ttl is None else ttl
+        self.ruta_indice = os.path.join(carpeta, "indice.json")
+        os.makedirs(carpeta, exist_ok=True)
+        self.indice = self._cargar_indice()
+
+    def _cargar_indice(self):
+        if not os.path.exists(self.ruta_indice):
+            return {}
+        try:
+            with open(self.ruta_indice, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"[-] Índice de caché ilegible, se empieza de cero: {str(e)}")
+            return {}
+
+    def _ruta(self, curso_id):
+        return os.path.join(self.carpeta, f"{curso_id}.json")
+
+    def edad(self, curso_id):
+        """Segundos desde la última descarga del curso, o None si no está en caché."""
+        entrada = self.indice.get(curso_id)
+        if not entrada:
+            return None
+        return (datetime.now() - datetime.fromisoformat(entrada['descargado'])).total_seconds()
+
+    def obtener(self, curso_id):
+        """Secciones del curso si están en caché, vigentes y sin alterar; si no, None."""
+        edad = self.edad(curso_id)
+        if edad is None or edad > self.ttl:
+            return None
+        try:
+            with open(self._ruta(curso_id), 'r', encoding='utf-8') as f:
+                datos = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        if hash_secciones(datos) != self.indice[curso_id]['hash']:
+            print(f"[-] Caché de {curso_id} no coincide con su hash, se descarta")
+            return None
+        return [Seccion.desde_dict(sec) for sec in datos]
+
+    def guardar(self, curso_id, secciones):
+        """Guarda el curso y registra la descarga. Devuelve True si el contenido cambió."""
+        datos = [sec.a_dict() for sec in secciones]
+        nuevo_hash = hash_secciones(datos)
+        ahora = datetime.now().isoformat(timespec='seconds')
+        cambio = True
+
+        def registrar(indice):
+            nonlocal cambio
+            anterior = indice.get(curso_id, {})
+            cambio = anterior.get('hash') != nuevo_hash
+            escribir_json_atomico(self._ruta(curso_id), datos)
+            indice[curso_id] = {
+                'descargado': ahora,
+                'cambiado': ahora if cambio else anterior.get('cambiado', ahora),
+                'hash': nuevo_hash,
+                'secciones': len(datos)
+            }
+
+        self.indice = actualizar_json_atomico(self.ruta_indice, registrar)
+        return cambio
@@ -0,0 +1,63 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+from archivos import actualizar_json_atomico
+from coincidencia_nombres import normalizar_nombre
+
+# Caché persistente de la búsqueda de perfiles en misprofesores: nombre de docente
+# (normalizado) -> URL del perfil y nombre que muestra el sitio. También guarda los
+# docentes sin perfil, con un TTL más corto porque el perfil puede crearse después.
+# Cada guardado relee el archivo bajo un cerrojo: dos recorridos a la vez suman sus
+# resultados en vez de pisarse.
+RUTA_CACHE_PERFILES = os.path.join("comentarios", "perfiles_cache.json")
+TTL_PERFILES = 30 * 24 * 60 * 60  # segundos
+TTL_SIN_PERFIL = 3 * 24 * 60 * 60
+
+class CachePerfiles:
+    def __init__(self, ruta=RUTA_CACHE_PERFILES, ttl=None, ttl_sin_perfil=None):
+        self.ruta = ruta
+        self.ttl = TTL_PERFILES if ttl is None else ttl
+        self.ttl_sin_perfil = TTL_SIN_PERFIL if ttl_sin_perfil is None else ttl_sin_perfil
+        self._lock = threading.Lock()
+        self.entradas = self._cargar()
+
+    def _cargar(self):
+        if not os.path.exists(self.ruta):
+            return {}
+        try:
+            with open(self.ruta, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"[-] Caché de perfiles ilegible, se empieza de cero: {str(e)}")
+            return {}
+
+    def obtener(self, nombre_docente):
+        """
+        (url, nombre_perfil) si el docente ya se resolvió y sigue vigente, (None, None)
+        si se sabe que no tiene perfil, o None si hay que buscarlo.
+        """
+        with self._lock:
+            entrada = self.entradas.get(normalizar_nombre(nombre_docente))
+        if not entrada:
+            return None
+        edad = (datetime.now() - datetime.fromisoformat(entrada['resuelto'])).total_seconds()
+        if edad > (self.ttl if entrada['url'] else self.ttl_sin_perfil):
+            return None
+        return entrada['url'], entrada['nombre']
+
+    def guardar(self, nombre_docente, url, nombre_perfil):
+        """Registra el resultado de una búsqueda; url=None marca al docente como sin perfil."""
+        clave = normalizar_nombre(nombre_docente)
+        entrada = {
+            'url': url,
+            'nombre': nombre_perfil,
+            'resuelto': datetime.now().isoformat(timespec='seconds')
+        }
+        with self._lock:
+            self.entradas[clave] = entrada
+            try:
+                self.entradas = actualizar_json_atomico(self.ruta, lambda datos: datos.update({clave: entrada}))
+            except OSError as e:
+                print(f"[-] No se pudo guardar la caché de perfiles: {str(e)}")
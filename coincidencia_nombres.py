@@ -0,0 +1,121 @@
+import re
+import unicodedata
+from difflib import SequenceMatcher
+
+# Emparejamiento de nombres de docentes entre fuentes que los escriben distinto (el
+# horario: "PEREZ DIAZ, JUAN CARLOS"; misprofesores: "Juan Pérez Díaz"). El índice
+# invertido token -> nombres deja comparar cada consulta solo con los nombres que
+# comparten al menos una palabra, en vez de con todos.
+
+PARTICULAS = {"DE", "DEL", "LA", "LAS", "LOS", "Y"}
+
+def normalizar_nombre(nombre):
+    """Mayúsculas, sin tildes ni signos y con espacios simples: 'Pérez-Díaz,  ana' -> 'PEREZ DIAZ ANA'."""
+    nombre = unicodedata.normalize('NFKD', nombre).encode('ASCII', 'ignore').decode('ascii')
+    return " ".join(re.sub(r"[^A-Z0-9]+", " ", nombre.upper()).split())
+
+def tokens_nombre(nombre):
+    return frozenset(normalizar_nombre(nombre).split())
+
+def primer_apellido(nombre):
+    """
+    Primer apellido si el nombre viene como en el horario ("PEREZ DIAZ, JUAN" -> 'PEREZ'),
+    o None si no lleva coma y no se sabe qué palabras son apellidos.
+    """
+    if "," not in nombre:
+        return None
+    apellidos = [t for t in normalizar_nombre(nombre.split(",")[0]).split() if t not in PARTICULAS]
+    return apellidos[0] if apellidos else None
+
+def clave_fonetica(token):
+    """Iguala grafías que suenan igual en español: PERES/PEREZ, CESPEDES/SESPEDES, HERRERA/ERERA."""
+    clave = re.sub(r"C([EI])", r"S\1", token.replace("H", ""))
+    clave = clave.replace("Z", "S").replace("V", "B").replace("Y", "I")
+    return re.sub(r"(.)\1+", r"\1", clave) or token
+
+def _tokens_parecidos(a, b, umbral):
+    return (a == b or clave_fonetica(a) == clave_fonetica(b)
+            or (min(len(a), len(b)) >= 4 and SequenceMatcher(None, a, b).ratio() >= umbral))
+
+class IndiceNombres:
+    def __init__(self, nombres, difuso=True, umbral=0.85):
+        """
+        nombres: los nombres a indexar (por ejemplo, las claves de comentarios.json).
+        difuso: si una palabra sin coincidencia exacta puede emparejarse con otra que
+        suena igual (PERES/PEREZ) o parecida (erratas, letras cambiadas) con similitud >= umbral.
+        """
+        self.difuso = difuso
+        self.umbral = umbral
+        self.nombres = []
+        self.tokens = []
+        self.apellidos = []
+        self.exactos = {}
+        self.invertido = {}
+        for nombre in nombres:
+            tokens = tokens_nombre(nombre)
+            if not tokens:
+                continue
+            i = len(self.nombres)
+            self.nombres.append(nombre)
+            self.tokens.append(tokens)
+            self.apellidos.append(primer_apellido(nombre))
+            self.exactos.setdefault(tokens, []).append(i)
+            for clave in {clave_fonetica(t) for t in tokens}:
+                self.invertido.setdefault(clave, []).append(i)
+
+    def _parecidos(self, a, b):
+        return a == b or (self.difuso and _tokens_parecidos(a, b, self.umbral))
+
+    def _coincidencias(self, consulta, candidato):
+        exactas = consulta & candidato
+        total = len(exactas)
+        if self.difuso:
+            libres = list(candidato - exactas)
+            for token in consulta - exactas:
+                for otro in libres:
+                    if _tokens_parecidos(token, otro, self.umbral):
+                        libres.remove(otro)
+                        total += 1
+                        break
+        return total
+
+    def _mismo_apellido(self, apellido, tokens, i):
+        """El primer apellido conocido (de la consulta o del candidato) debe estar en el otro nombre."""
+        otro = self.apellidos[i]
+        if apellido and otro:
+            return self._parecidos(apellido, otro)
+        if apellido:
+            return any(self._parecidos(apellido, t) for t in self.tokens[i])
+        if otro:
+            return any(self._parecidos(otro, t) for t in tokens)
+        return True
+
+    def buscar(self, nombre, estricto=True, minimo=2):
+        """
+        El nombre indexado que mejor corresponde a `nombre`, o None. El primer apellido
+        (la primera palabra antes de la coma en el formato del horario) siempre debe
+        coincidir. Con estricto, además, todas las palabras del más corto de los dos deben
+        aparecer en el otro (el sitio suele omitir el segundo nombre o apellido); sin él
+        basta con `minimo` palabras en común. Si dos nombres empatan, devuelve None.
+        """
+        consulta = tokens_nombre(nombre)
+        apellido = primer_apellido(nombre)
+        exactos = [self.nombres[i] for i in self.exactos.get(consulta, ())
+                   if self._mismo_apellido(apellido, consulta, i)]
+        if len(set(exactos)) == 1:
+            return exactos[0]
+        candidatos = {i for t in consulta for i in self.invertido.get(clave_fonetica(t), ())}
+        mejores, mejor_puntaje = set(), None
+        for i in candidatos:
+            tokens = self.tokens[i]
+            comunes = self._coincidencias(consulta, tokens)
+            if comunes < minimo or (estricto and comunes < min(len(consulta), len(tokens))):
+                continue
+            if not self._mismo_apellido(apellido, consulta, i):
+                continue
+            puntaje = (comunes, -len(consulta ^ tokens))
+            if mejor_puntaje is None or puntaje > mejor_puntaje:
+                mejores, mejor_puntaje = {self.nombres[i]}, puntaje
+            elif puntaje == mejor_puntaje:
+                mejores.add(self.nombres[i])
+        return mejores.pop() if len(mejores) == 1 else None
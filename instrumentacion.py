@@ -0,0 +1,154 @@
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Tramos medidos (login, extracción, generación de horarios, PDF, búsqueda de perfiles,
+# inferencia...) guardados como una línea JSON cada uno en HORARIOS_METRICAS. Cada
+# tramo lleva su duración, sus contadores, la memoria (RSS) y la corrida a la que
+# pertenece. La corrida se guarda en una ContextVar, así que cada sesión de Streamlit
+# (todas en el mismo proceso) registra la suya; a los scripts lanzados como
+# subproceso se les pasa en la variable de entorno HORARIOS_CORRIDA.
+#
+# La memoria es la del proceso entero: rss_pico_proceso_kb es su pico hasta el final
+# del tramo (en Streamlit, el de todo el servidor) y rss_crecimiento_kb cuánto subió
+# ese pico durante el tramo, que sí es atribuible a él.
+#
+#   with tramo("extraccion.curso", curso=curso_id) as t:
+#       ...
+#       t.contar("secciones", len(data))
+
+ARCHIVO_METRICAS = os.getenv("HORARIOS_METRICAS", os.path.join("metricas", "metricas.jsonl"))
+
+_lock = threading.Lock()
+_local = threading.local()
+_corrida = ContextVar("corrida", default=None)
+# Corrida del proceso cuando nadie fijó una: la heredada del padre o una nueva
+_corrida_proceso = os.getenv("HORARIOS_CORRIDA") or uuid.uuid4().hex[:12]
+
+def corrida_actual():
+    return _corrida.get() or _corrida_proceso
+
+def nueva_corrida():
+    """Empieza una corrida nueva en el contexto actual y devuelve su id."""
+    corrida = uuid.uuid4().hex[:12]
+    _corrida.set(corrida)
+    return corrida
+
+def fijar_corrida(corrida):
+    """Los tramos de este contexto (hilo, sesión) se registran en `corrida`."""
+    _corrida.set(corrida)
+
+def entorno_con_corrida(corrida=None):
+    """Copia de os.environ para un subproceso cuyos tramos deben ir a `corrida`."""
+    entorno = dict(os.environ)
+    entorno["HORARIOS_CORRIDA"] = corrida or corrida_actual()
+    return entorno
+
+def rss_pico_kb():
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico // 1024 if sys.platform == "darwin" else pico  # macOS lo da en bytes
+
+def _escribir(registro):
+    linea = json.dumps(registro, ensure_ascii=False, default=str)
+    with _lock:
+        carpeta = os.path.dirname(ARCHIVO_METRICAS)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        with open(ARCHIVO_METRICAS, "a", encoding="utf-8") as f:
+            f.write(linea + "\n")
+
+class Tramo:
+    def __init__(self, nombre, **atributos):
+        self.nombre = nombre
+        self.atributos = atributos
+        self.contadores = {}
+
+    def contar(self, clave, cantidad=1):
+        self.contadores[clave] = self.contadores.get(clave, 0) + cantidad
+
+    def __enter__(self):
+        pila = _local.__dict__.setdefault("pila", [])
+        self.padre = pila[-1].nombre if pila else None
+        pila.append(self)
+        self.inicio = datetime.now()
+        self._rss0 = rss_pico_kb()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, error, _traza):
+        segundos = time.perf_counter() - self._t0
+        rss = rss_pico_kb()
+        _local.pila.pop()
+        try:
+            _escribir({
+                "corrida": corrida_actual(),
+                "tramo": self.nombre,
+                "padre": self.padre,
+                "inicio": self.inicio.isoformat(timespec="milliseconds"),
+                "segundos": round(segundos, 4),
+                "rss_pico_proceso_kb": rss,
+                "rss_crecimiento_kb": None if rss is None else rss - self._rss0,
+                "pid": os.getpid(),
+                "error": f"{tipo.__name__}: {error}" if tipo else None,
+                "contadores": self.contadores,
+                **self.atributos
+            })
+        except OSError as e:
+            print(f"[-] No se pudo registrar el tramo {self.nombre}: {str(e)}")
+        return False
+
+def tramo(nombre, **atributos):
+    return Tramo(nombre, **atributos)
+
+def leer_metricas(ruta=None, corrida=None):
+    ruta = ruta or ARCHIVO_METRICAS
+    if not os.path.exists(ruta):
+        return []
+    registros = []
+    with open(ruta, "r", encoding="utf-8") as f:
+        for linea in f:
+            try:
+                registro = json.loads(linea)
+            except json.JSONDecodeError:
+                continue  # línea cortada por una escritura interrumpida
+            if corrida is None or registro.get("corrida") == corrida:
+                registros.append(registro)
+    return registros
+
+def resumir(registros):
+    """
+    Una fila por tramo: veces, tiempo total/medio/máximo, contadores sumados, cuánto
+    hizo crecer el pico de memoria y el pico del proceso al terminar.
+    """
+    import pandas as pd
+    filas = {}
+    for r in registros:
+        fila = filas.setdefault(r["tramo"], {"tramo": r["tramo"], "veces": 0, "total_s": 0.0,
+                                             "max_s": 0.0, "errores": 0, "rss_crecimiento_mb": 0.0,
+                                             "rss_pico_proceso_mb": 0.0})
+        fila["veces"] += 1
+        fila["total_s"] += r["segundos"]
+        fila["max_s"] = max(fila["max_s"], r["segundos"])
+        fila["errores"] += 1 if r.get("error") else 0
+        fila["rss_crecimiento_mb"] += (r.get("rss_crecimiento_kb") or 0) / 1024
+        fila["rss_pico_proceso_mb"] = max(fila["rss_pico_proceso_mb"], (r.get("rss_pico_proceso_kb") or 0) / 1024)
+        for clave, valor in r.get("contadores", {}).items():
+            fila[clave] = fila.get(clave, 0) + valor
+    resumen = pd.DataFrame(list(filas.values())).fillna(0)  # contador ausente = 0
+    if not resumen.empty:
+        resumen["medio_s"] = resumen["total_s"] / resumen["veces"]
+        resumen = resumen.round({"total_s": 3, "max_s": 3, "medio_s": 3,
+                                 "rss_crecimiento_mb": 1, "rss_pico_proceso_mb": 1})
+    return resumen
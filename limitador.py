@@ -0,0 +1,67 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+# Límite de peticiones compartido: un token bucket con jitter que baja la tasa cuando
+# el servidor responde con errores o lento y la recupera poco a poco cuando responde
+# bien. Solo se espera cuando se agotan las fichas, no en cada petición.
+
+class Limitador:
+    def __init__(self, tasa=1.0, rafaga=3, jitter=0.25, tasa_minima=0.1, lento=5.0, nombre="servidor"):
+        """
+        tasa: peticiones por segundo en régimen normal; rafaga: cuántas pueden salir
+        seguidas sin esperar; jitter: fracción aleatoria que se suma a cada espera;
+        lento: segundos a partir de los cuales una respuesta cuenta como lenta.
+        """
+        self.nombre = nombre
+        self.tasa_base = tasa
+        self.tasa = tasa
+        self.tasa_minima = tasa_minima
+        self.capacidad = rafaga
+        self.jitter = jitter
+        self.lento = lento
+        self._fichas = float(rafaga)
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reservar(self):
+        """Toma una ficha (puede quedar en deuda) y devuelve cuánto hay que esperar por ella."""
+        with self._lock:
+            ahora = time.monotonic()
+            self._fichas = min(self.capacidad, self._fichas + (ahora - self._ultimo) * self.tasa)
+            self._ultimo = ahora
+            self._fichas -= 1
+            if self._fichas >= 0:
+                return 0.0
+            return -self._fichas / self.tasa
+
+    def esperar(self):
+        espera = self._reservar()
+        if espera > 0:
+            espera *= 1 + random.uniform(0, self.jitter)
+            time.sleep(espera)
+        return espera
+
+    def registrar(self, duracion=None, error=False):
+        """Ajusta la tasa: la mitad ante un error o respuesta lenta, +25 % si fue bien."""
+        with self._lock:
+            if error or (duracion is not None and duracion > self.lento):
+                self.tasa = max(self.tasa_minima, self.tasa / 2)
+                if error:
+                    self._fichas = min(self._fichas, 0.0)
+                print(f"[-] {self.nombre}: bajando a {self.tasa:.2f} peticiones/s")
+            elif self.tasa < self.tasa_base:
+                self.tasa = min(self.tasa_base, self.tasa * 1.25)
+
+    @contextmanager
+    def peticion(self):
+        """Espera turno, mide la petición del bloque y ajusta la tasa según el resultado."""
+        self.esperar()
+        inicio = time.monotonic()
+        try:
+            yield
+        except Exception:
+            self.registrar(error=True)
+            raise
+        self.registrar(time.monotonic() - inicio)
@@ -2,20 +2,36 @@ from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import StaleElementReferenceException, TimeoutException
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 from reportlab.platypus import Table, TableStyle
 from reportlab.lib import colors
 from reportlab.lib.units import cm  # Importar cm
 from datetime import datetime
-from itertools import product
+from itertools import product, islice, count, chain
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import multiprocessing
+import numpy as np
 import pandas as pd
 import re
-import random
 import os
-import time
 from dotenv import load_dotenv
+from lxml import html as lxml_html, etree
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from puntaje import INICIO_MANANA, FIN_MANANA, puntaje_sesiones, puntuar_csv
+from secciones import Seccion, Sesion, minutos_a_hora
+from limitador import Limitador
+from cache_horarios import CacheSecciones, TTL_POR_DEFECTO
+from pool_chrome import pool_global
+from instrumentacion import tramo
+from coincidencia_nombres import IndiceNombres
 import json
+import heapq
+import time
+import weakref
 
 # Configuración inicial
 load_dotenv()
@@ -40,16 +56,58 @@ def setup_chrome():
         print(f"[-] Error al configurar Chrome: {str(e)}")
         raise
 
-def random_delay(context):
-    delays = {
-        'navegacion': random.uniform(2, 4),
-        'carga': random.uniform(1, 3),
-        'combinaciones': random.uniform(1, 2),
-        'extraccion': random.uniform(0.5, 1.5)
-    }
-    delay = delays.get(context, random.uniform(1, 3))
-    print(f"[+] Retraso de {delay:.2f} segundos para {context}")
-    return delay
+def pool_navegadores():
+    """Pool de navegadores para el portal, compartido por todas las sesiones del proceso."""
+    return pool_global("portal", setup_chrome)
+
+# Segundos que el login espera un navegador del pool antes de abrir uno propio
+ESPERA_POOL_LOGIN = 10
+# Navegadores abiertos fuera del pool porque estaba lleno; se cierran al liberarlos
+_drivers_aparte = weakref.WeakSet()
+
+def tomar_driver_login():
+    """Navegador del pool; si están todos prestados, uno aparte que se cierra al liberarlo."""
+    try:
+        return pool_navegadores().tomar(timeout=ESPERA_POOL_LOGIN)
+    except TimeoutError:
+        print("[-] Pool de navegadores ocupado, se abre un navegador aparte")
+        driver = setup_chrome()
+        _drivers_aparte.add(driver)
+        return driver
+
+def mantener_driver(driver):
+    """
+    Renueva el préstamo del navegador antes de cada paso que lo usa. False si el pool
+    ya lo dio por abandonado y lo cerró (por ejemplo, un captcha que tardó demasiado).
+    """
+    return driver in _drivers_aparte or pool_navegadores().renovar(driver)
+
+def liberar_driver(driver):
+    """Devuelve el navegador al pool o cierra el aparte; si el pool ya lo cerró, no hace nada."""
+    if not driver:
+        return
+    pool = pool_navegadores()
+    if pool.es_propio(driver):
+        pool.devolver(driver)
+    elif driver in _drivers_aparte:
+        _drivers_aparte.discard(driver)
+        driver.quit()
+
+# Todas las peticiones al portal (clics que cargan páginas y descargas HTTP) pasan por aquí
+limitador_portal = Limitador(tasa=float(os.getenv("PORTAL_PETICIONES_POR_SEGUNDO", "1")), rafaga=3,
+                             nombre="portal")
+
+def esperar_cambio_de_pagina(driver, elemento, timeout=20):
+    """Espera a que `elemento` deje de estar visible (la página cambió o se recargó)."""
+    def desaparecio(d):
+        try:
+            return not elemento.is_displayed()
+        except StaleElementReferenceException:
+            return True
+    try:
+        WebDriverWait(driver, timeout).until(desaparecio)
+    except TimeoutException:
+        print("[-] La página no cambió a tiempo, se continúa")
 
 def parse_horario(hora_str):
     try:
@@ -66,19 +124,15 @@ def parse_horario(hora_str):
 def group_by_liga(secciones):
     grupos = {}
     for sec in secciones:
-        liga_base = sec['id_liga'][0]  # Extraer la parte base (T, P, L)
-        liga_num = sec['id_liga'][1:]  # Extraer el número (1, 2, 3)
-        grupos.setdefault(liga_base, {}).setdefault(liga_num, []).append(sec)
+        grupos.setdefault(sec.tipo, {}).setdefault(sec.grupo, []).append(sec)
     return grupos
 
-def generar_combinaciones_todos_cursos(secciones):
-    from itertools import product
-
+def agrupar_opciones_por_curso(secciones):
     cursos = {}
 
     # Agrupar secciones por curso
     for sec in secciones:
-        cursos.setdefault(sec['curso'], []).append(sec)
+        cursos.setdefault(sec.curso, []).append(sec)
 
     combinaciones_por_curso = {}
 
@@ -86,9 +140,7 @@ def generar_combinaciones_todos_cursos(secciones):
         # Agrupar por número de liga: L1, T1, P1 => grupo 1, etc.
         ligas_por_num = {}
         for sec in secciones_curso:
-            tipo = sec['id_liga'][0]  # L, T, P
-            num = sec['id_liga'][1:]  # 1, 2, 3...
-            ligas_por_num.setdefault(num, {}).setdefault(tipo, []).append(sec)
+            ligas_por_num.setdefault(sec.grupo, {}).setdefault(sec.tipo, []).append(sec)
 
         # Generar combinaciones dentro del curso, respetando cada grupo de liga
         combinaciones_validas = []
@@ -99,18 +151,630 @@ def generar_combinaciones_todos_cursos(secciones):
         
         combinaciones_por_curso[curso] = combinaciones_validas
 
+    return combinaciones_por_curso
+
+def contar_combinaciones(combinaciones_por_curso):
+    total = 1
+    for opciones in combinaciones_por_curso.values():
+        total *= len(opciones)
+    return total
+
+def iterar_combinaciones_todos_cursos(secciones, inicio=0):
+    """
+    Genera las combinaciones entre cursos una a una, en el mismo orden que
+    itertools.product, sin materializar la lista completa.
+    `inicio` permite reanudar desde un cursor (número de combinaciones ya consumidas).
+    """
+    combinaciones_por_curso = agrupar_opciones_por_curso(secciones)
+    if inicio >= contar_combinaciones(combinaciones_por_curso):
+        return
+    opciones = list(combinaciones_por_curso.values())
+
+    # Traducir el cursor a un índice por curso (el último curso varía más rápido)
+    indices = []
+    resto = inicio
+    for ops in reversed(opciones):
+        resto, idx = divmod(resto, len(ops))
+        indices.append(idx)
+    indices.reverse()
+
+    while True:
+        yield tuple(ops[idx] for ops, idx in zip(opciones, indices))
+        pos = len(indices) - 1
+        while pos >= 0:
+            indices[pos] += 1
+            if indices[pos] < len(opciones[pos]):
+                break
+            indices[pos] = 0
+            pos -= 1
+        if pos < 0:
+            return
+
+def generar_combinaciones_todos_cursos(secciones):
     # Ahora combinar entre cursos
-    return list(product(*combinaciones_por_curso.values()))
+    return list(iterar_combinaciones_todos_cursos(secciones))
+
+# Representación de la semana como máscara de bits: un bit por bloque de 5 minutos
+MINUTOS_POR_SLOT = 5
+SLOTS_POR_DIA = 24 * 60 // MINUTOS_POR_SLOT
+INDICE_DIAS = {'LUN': 0, 'MAR': 1, 'MIE': 2, 'JUE': 3, 'VIE': 4, 'SAB': 5, 'DOM': 6,
+               'Lunes': 0, 'Martes': 1, 'Miércoles': 2, 'Jueves': 3, 'Viernes': 4,
+               'Sábado': 5, 'Domingo': 6}
+
+DIAS_COMPLETOS = {'LUN': 'Lunes', 'MAR': 'Martes', 'MIE': 'Miércoles',
+                  'JUE': 'Jueves', 'VIE': 'Viernes', 'SAB': 'Sábado', 'DOM': 'Domingo'}
+
+def nombre_dia(dia):
+    return DIAS_COMPLETOS.get(dia, dia)
+
+def _minutos(hora):
+    return hora.hour * 60 + hora.minute
+
+def _indice_dia(dia):
+    if dia not in INDICE_DIAS:
+        INDICE_DIAS[dia] = max(INDICE_DIAS.values()) + 1
+    return INDICE_DIAS[dia]
+
+def mascara_sesion(sesion):
+    """
+    Máscara de una sesión. El inicio se redondea hacia abajo y el fin hacia arriba
+    al bloque de 5 minutos, así que dos sesiones que solo se tocan no se cruzan.
+    """
+    inicio = sesion.inicio // MINUTOS_POR_SLOT
+    fin = -(-sesion.fin // MINUTOS_POR_SLOT)
+    if fin <= inicio:
+        return 0
+    return ((1 << (fin - inicio)) - 1) << (_indice_dia(sesion.dia) * SLOTS_POR_DIA + inicio)
+
+def compilar_mascara(sesiones):
+    """Une las sesiones en una sola máscara; devuelve None si se cruzan entre sí."""
+    mascara = 0
+    for sesion in sesiones:
+        m = mascara_sesion(sesion)
+        if mascara & m:
+            return None
+        mascara |= m
+    return mascara
+
+def mascara_opcion(opcion):
+    return compilar_mascara([sesion for sec in opcion for sesion in sec.sesiones])
+
+def sesiones_opcion(opcion):
+    return tuple((_indice_dia(sesion.dia), sesion.inicio, sesion.fin)
+                 for sec in opcion for sesion in sec.sesiones)
+
+# Preferencias del estudiante. Se declaran como diccionario, por ejemplo:
+#   {'dias_excluidos': ['SAB'], 'hora_minima': '09:00', 'hora_maxima': '20:00',
+#    'docentes_excluidos': [...], 'docentes_preferidos': [...], 'max_dias': 4}
+# Todas las claves son opcionales.
+def _hora_a_minutos(valor):
+    if isinstance(valor, str):
+        horas, minutos = valor.split(':')[:2]
+        return int(horas) * 60 + int(minutos)
+    return _minutos(valor)
+
+def _normalizar_docente(nombre):
+    return " ".join(nombre.upper().split())
+
+def compilar_restricciones(restricciones):
+    """
+    Traduce las preferencias a filtros sobre la máscara de la semana: los días
+    excluidos y los bloques antes de `hora_minima` o desde `hora_maxima` quedan
+    prohibidos, de modo que una sección se descarta con un solo AND.
+    """
+    restricciones = restricciones or {}
+    excluidos = {_indice_dia(dia) for dia in restricciones.get('dias_excluidos') or []}
+    minimo = restricciones.get('hora_minima')
+    maximo = restricciones.get('hora_maxima')
+    prohibido = 0
+    for dia in set(INDICE_DIAS.values()):
+        base = dia * SLOTS_POR_DIA
+        if dia in excluidos:
+            prohibido |= ((1 << SLOTS_POR_DIA) - 1) << base
+            continue
+        if minimo is not None:
+            prohibido |= ((1 << (_hora_a_minutos(minimo) // MINUTOS_POR_SLOT)) - 1) << base
+        if maximo is not None:
+            desde = -(-_hora_a_minutos(maximo) // MINUTOS_POR_SLOT)
+            prohibido |= ((1 << (SLOTS_POR_DIA - desde)) - 1) << (base + desde)
+    return {
+        'prohibido': prohibido,
+        'max_dias': restricciones.get('max_dias') or None,
+    }
+
+def resolver_docentes(nombres, docentes, avisos=None):
+    """
+    Traduce los nombres escritos por el estudiante a los docentes de las secciones
+    ("perez diaz juan" -> "PEREZ DIAZ, JUAN CARLOS"). Los que no corresponden a
+    ningún docente se anotan en `avisos` (lista), si se pasa.
+    """
+    indice = IndiceNombres(docentes)
+    resueltos = set()
+    for nombre in nombres:
+        docente = indice.buscar(nombre)
+        if docente is None:
+            print(f"[-] Ningún docente de estos cursos coincide con '{nombre}'")
+            if avisos is not None:
+                avisos.append(f"ningún docente de estos cursos coincide con '{nombre}'")
+        else:
+            resueltos.add(_normalizar_docente(docente))
+    return resueltos
+
+def filtrar_opciones(combinaciones_por_curso, restricciones, avisos=None):
+    """
+    Aplica las preferencias sección por sección antes de la búsqueda y descarta
+    los grupos de liga que contienen alguna sección que no las cumple. Con
+    `docentes_preferidos`, en cada curso y tipo (T, P, L) donde dicta alguno de
+    ellos solo se conservan sus secciones. Los nombres de docentes se emparejan
+    palabra por palabra, sin importar tildes, mayúsculas ni el orden.
+    """
+    reglas = compilar_restricciones(restricciones)
+    docentes = {sec.docente for opciones in combinaciones_por_curso.values()
+                for opcion in opciones for sec in opcion}
+    reglas['docentes_excluidos'] = resolver_docentes(
+        (restricciones or {}).get('docentes_excluidos') or [], docentes, avisos)
+    preferidos = reglas['docentes_preferidos'] = resolver_docentes(
+        (restricciones or {}).get('docentes_preferidos') or [], docentes, avisos)
+    tipos_con_preferido = set()
+    for curso, opciones in combinaciones_por_curso.items():
+        for opcion in opciones:
+            for sec in opcion:
+                if _normalizar_docente(sec.docente) in preferidos:
+                    tipos_con_preferido.add((curso, sec.tipo))
+
+    def cumple(sec):
+        docente = _normalizar_docente(sec.docente)
+        if docente in reglas['docentes_excluidos']:
+            return False
+        if (sec.curso, sec.tipo) in tipos_con_preferido and docente not in preferidos:
+            return False
+        mascara = compilar_mascara(sec.sesiones)
+        return mascara is None or not mascara & reglas['prohibido']
+
+    evaluadas = {}
+    for opciones in combinaciones_por_curso.values():
+        for opcion in opciones:
+            for sec in opcion:
+                if id(sec) not in evaluadas:
+                    evaluadas[id(sec)] = cumple(sec)
+    return {curso: [opcion for opcion in opciones if all(evaluadas[id(sec)] for sec in opcion)]
+            for curso, opciones in combinaciones_por_curso.items()}
+
+def construir_indice_conflictos(combinaciones_por_curso, max_dias=None):
+    """
+    Precalcula, una sola vez, qué opciones (grupos de liga de un curso) se cruzan
+    entre sí. Las opciones de un curso con exactamente las mismas sesiones forman
+    una clase de equivalencia (solo cambian NRC o docente), y la búsqueda trabaja
+    sobre clases. Devuelve un diccionario con:
+      - 'cursos', 'clases', 'pesos', 'mascaras', 'sesiones', 'curso_de': las clases
+        sin cruces internos, numeradas globalmente, con sus opciones concretas, la
+        cantidad de ellas, sus sesiones como (día, inicio, fin) en minutos y el curso
+        al que pertenece cada una.
+      - 'conflictos': matriz booleana NumPy (clase x clase) de cruces de horario.
+      - 'compatibles': por clase, conjunto de bits con las clases compatibles.
+      - 'dominios': por curso, conjunto de bits con sus clases.
+      - 'dias' y 'max_dias': por clase, conjunto de bits con los días que usa, y el
+        máximo de días con clases permitido (None si no hay límite); las clases que
+        por sí solas lo superan se descartan.
+      - 'cursos_sin_opciones' y 'pares_imposibles': cursos o pares de cursos que
+        nunca pueden llevarse juntos.
+    """
+    cursos = list(combinaciones_por_curso)
+    clases, mascaras, sesiones, dias, curso_de, dominios = [], [], [], [], [], []
+    for pos, curso in enumerate(cursos):
+        dominio = 0
+        clase_por_sesiones = {}
+        for opcion in combinaciones_por_curso[curso]:
+            mascara = mascara_opcion(opcion)
+            if mascara is None:
+                continue
+            clave = tuple(sorted(sesiones_opcion(opcion)))
+            dias_clase = sum({1 << dia for dia, _, _ in clave})
+            if max_dias and dias_clase.bit_count() > max_dias:
+                continue
+            if clave in clase_por_sesiones:
+                clases[clase_por_sesiones[clave]].append(opcion)
+                continue
+            clase_por_sesiones[clave] = len(clases)
+            dominio |= 1 << len(clases)
+            clases.append([opcion])
+            mascaras.append(mascara)
+            sesiones.append(clave)
+            dias.append(dias_clase)
+            curso_de.append(pos)
+        dominios.append(dominio)
+
+    # Matriz clase x bloque de 5 minutos; dos clases se cruzan si comparten algún bloque
+    n = len(clases)
+    n_bytes = (max((m.bit_length() for m in mascaras), default=0) + 7) // 8
+    crudo = np.frombuffer(b"".join(m.to_bytes(n_bytes, "little") for m in mascaras), dtype=np.uint8)
+    semana = np.unpackbits(crudo.reshape(n, n_bytes), axis=1, bitorder="little").astype(np.float32)
+    conflictos = (semana @ semana.T) > 0
+
+    libres = np.packbits(~conflictos, axis=1, bitorder="little")
+    compatibles = [int.from_bytes(fila.tobytes(), "little") for fila in libres]
+
+    curso_de = np.array(curso_de, dtype=np.intp)
+    cursos_sin_opciones = [curso for curso, dominio in zip(cursos, dominios) if not dominio]
+    pares_imposibles = []
+    for a in range(len(cursos)):
+        for b in range(a + 1, len(cursos)):
+            bloque = conflictos[np.ix_(curso_de == a, curso_de == b)]
+            if bloque.size and bloque.all():
+                pares_imposibles.append((cursos[a], cursos[b]))
+
+    return {
+        'cursos': cursos,
+        'clases': clases,
+        'pesos': [len(clase) for clase in clases],
+        'mascaras': mascaras,
+        'sesiones': sesiones,
+        'curso_de': curso_de,
+        'conflictos': conflictos,
+        'compatibles': compatibles,
+        'dominios': dominios,
+        'dias': dias,
+        'max_dias': max_dias,
+        'admisibles_por_dias': {},
+        'cursos_sin_opciones': cursos_sin_opciones,
+        'pares_imposibles': pares_imposibles,
+    }
+
+def diagnosticar_imposibles(indice):
+    mensajes = [f"{curso} no tiene ningún grupo de liga sin cruces que cumpla las preferencias"
+                for curso in indice['cursos_sin_opciones']]
+    mensajes += [f"{a} y {b} siempre se cruzan" for a, b in indice['pares_imposibles']]
+    return mensajes
+
+def _iterar_bits(conjunto):
+    while conjunto:
+        bit = conjunto & -conjunto
+        yield bit.bit_length() - 1
+        conjunto ^= bit
+
+def _clases_admisibles(indice, dias_usados):
+    """Clases que se pueden sumar a los días ya usados sin pasar el máximo de días."""
+    memoria = indice['admisibles_por_dias']
+    if dias_usados not in memoria:
+        admisibles = 0
+        for op, dias_clase in enumerate(indice['dias']):
+            if (dias_usados | dias_clase).bit_count() <= indice['max_dias']:
+                admisibles |= 1 << op
+        memoria[dias_usados] = admisibles
+    return memoria[dias_usados]
+
+def _clases_permitidas(indice, op, dias_usados):
+    """
+    Clases que pueden acompañar a `op` dada la semana ya usada: las compatibles con
+    ella y, si hay máximo de días, las que no lo superan junto con lo ya elegido.
+    """
+    permitidas = indice['compatibles'][op]
+    if indice['max_dias']:
+        permitidas &= _clases_admisibles(indice, dias_usados | indice['dias'][op])
+    return permitidas
+
+def _propagar(indice, restantes, pos, op, dias_usados):
+    """Filtra los dominios pendientes tras elegir `op`; None si alguno queda vacío."""
+    permitidas = _clases_permitidas(indice, op, dias_usados)
+    filtrados = {}
+    for p, dominio in restantes.items():
+        if p == pos:
+            continue
+        dominio &= permitidas
+        if not dominio:
+            return None
+        filtrados[p] = dominio
+    return filtrados
+
+def buscar_asignaciones(indice, dominios=None):
+    """
+    Backtracking con forward checking sobre el índice de conflictos: en cada paso se
+    asigna el curso con menos opciones restantes y se filtran los dominios del resto
+    con la tabla de compatibles (y el máximo de días, si hay); si alguno queda
+    vacío, se poda la rama.
+    Genera tuplas de ids de clase, una por curso y en el orden de indice['cursos'].
+    """
+    if dominios is None:
+        dominios = indice['dominios']
+    dias = indice['dias']
+    asignacion = [None] * len(dominios)
+
+    def backtrack(restantes, dias_usados):
+        if not restantes:
+            yield tuple(asignacion)
+            return
+        pos = min(restantes, key=lambda p: restantes[p].bit_count())
+        for op in _iterar_bits(restantes[pos]):
+            filtrados = _propagar(indice, restantes, pos, op, dias_usados)
+            if filtrados is not None:
+                asignacion[pos] = op
+                yield from backtrack(filtrados, dias_usados | dias[op])
+
+    yield from backtrack(dict(enumerate(dominios)), 0)
+
+def resolver_horarios(secciones, indice=None):
+    """
+    Busca horarios válidos por backtracking: asigna un curso a la vez (primero los
+    de menos opciones) y descarta la asignación parcial apenas una sección se cruza
+    con las ya elegidas. Genera solo combinaciones válidas, con el mismo formato que
+    iterar_combinaciones_todos_cursos.
+    """
+    if indice is None:
+        indice = construir_indice_conflictos(agrupar_opciones_por_curso(secciones))
+    for ids in buscar_asignaciones(indice):
+        yield from expandir_asignacion(indice, ids)
+
+def peso_asignacion(indice, ids):
+    """Cantidad de combinaciones concretas que representa una asignación de clases."""
+    peso = 1
+    for op in ids:
+        peso *= indice['pesos'][op]
+    return peso
+
+def expandir_asignacion(indice, ids):
+    """Genera, bajo demanda, las combinaciones concretas (NRC) de una asignación de clases."""
+    return product(*(indice['clases'][op] for op in ids))
+
+def _expandir_hasta(indice, asignaciones, limite):
+    return list(islice(chain.from_iterable(expandir_asignacion(indice, ids) for ids in asignaciones), limite))
+
+def _componentes_independientes(dominios, choques):
+    """Agrupa los cursos cuyos dominios pueden cruzarse entre sí, directa o indirectamente."""
+    alcances = []
+    for dominio in dominios:
+        alcance = 0
+        for op in _iterar_bits(dominio):
+            alcance |= choques[op]
+        alcances.append(alcance)
+    pendientes = list(range(len(dominios)))
+    grupos = []
+    while pendientes:
+        grupo = [pendientes.pop()]
+        for a in grupo:
+            enlazados = [b for b in pendientes if alcances[a] & dominios[b]]
+            for b in enlazados:
+                pendientes.remove(b)
+            grupo.extend(enlazados)
+        grupos.append(tuple(sorted(dominios[p] for p in grupo)))
+    return grupos
+
+class CuentaIncompleta(Exception):
+    """La cuenta superó su tiempo límite; `minimo` es una cota inferior del total."""
+    def __init__(self, minimo):
+        super().__init__(f"cuenta interrumpida con al menos {minimo} horarios")
+        self.minimo = minimo
+
+def contar_horarios_validos(secciones, indice=None, limite=None):
+    """
+    Cuenta exactamente los horarios sin cruces, sin enumerarlos. El estado de la
+    cuenta son los dominios (conjuntos de clases) que les quedan a los cursos
+    pendientes tras el forward checking: asignaciones parciales distintas que dejan
+    los mismos dominios se cuentan una sola vez, y cuando los cursos pendientes se
+    separan en grupos que ya no pueden cruzarse entre sí, la cuenta es el producto
+    de la de cada grupo. Cada clase aporta tantas combinaciones como opciones
+    concretas tiene. Con `limite` (segundos), si no termina a tiempo lanza
+    CuentaIncompleta con lo que alcanzó a contar.
+    """
+    if indice is None:
+        indice = construir_indice_conflictos(agrupar_opciones_por_curso(secciones))
+    fin = time.monotonic() + limite if limite else None
+    pesos = indice['pesos']
+    choques = [~libres for libres in indice['compatibles']]
+    # El máximo de días relaciona a todos los cursos, así que con él no se separan
+    # grupos y los días usados pasan a ser parte del estado
+    max_dias = indice['max_dias']
+    dias = indice['dias'] if max_dias else [0] * len(pesos)
+    memoria = {}
+
+    def contar(dominios, dias_usados):
+        if len(dominios) == 1 and not max_dias:
+            return sum(pesos[op] for op in _iterar_bits(dominios[0]))
+        clave = (dominios, dias_usados)
+        if clave in memoria:
+            return memoria[clave]
+        if fin is not None and time.monotonic() > fin:
+            raise CuentaIncompleta(0)
+        grupos = [] if max_dias else _componentes_independientes(dominios, choques)
+        if len(grupos) > 1:
+            total = 1
+            for i, grupo in enumerate(grupos):
+                try:
+                    total *= contar(grupo, 0)
+                except CuentaIncompleta as e:
+                    # Solo es cota si no quedan grupos sin contar (podrían valer 0)
+                    e.minimo = total * e.minimo if i == len(grupos) - 1 else 0
+                    raise
+                if not total:
+                    break
+        else:
+            # Ramificar siempre en el mismo orden de cursos hace que las ramas
+            # lleguen a los mismos dominios y se reutilice más la memoria
+            primero, resto = dominios[0], dominios[1:]
+            total = 0
+            for op in _iterar_bits(primero):
+                permitidas = _clases_permitidas(indice, op, dias_usados)
+                filtrados = tuple(sorted(d & permitidas for d in resto))
+                if not all(filtrados):
+                    continue
+                try:
+                    total += pesos[op] * (contar(filtrados, dias_usados | dias[op]) if filtrados else 1)
+                except CuentaIncompleta as e:
+                    e.minimo = total + pesos[op] * e.minimo
+                    raise
+        memoria[clave] = total
+        return total
+
+    dominios = tuple(sorted(indice['dominios']))
+    if not dominios:
+        return 1
+    return contar(dominios, 0)
+
+# Estado de cada proceso trabajador en la búsqueda paralela
+_indice_trabajador = None
+_encontrados_por_particion = None
+
+def _iniciar_trabajador(indice, encontrados):
+    global _indice_trabajador, _encontrados_por_particion
+    _indice_trabajador = indice
+    _encontrados_por_particion = encontrados
+
+def _resolver_particion(particion, dominios, limite):
+    resultados = []
+    encontrados = 0
+    for ids in buscar_asignaciones(_indice_trabajador, dominios):
+        resultados.append(ids)
+        encontrados = min(encontrados + peso_asignacion(_indice_trabajador, ids), limite)
+        _encontrados_por_particion[particion] = encontrados
+        # Lo que encuentren las particiones anteriores va primero al unir, así que
+        # cuando entre todas cubren el límite el resto de esta partición sobra
+        if encontrados + sum(_encontrados_por_particion[:particion]) >= limite:
+            break
+    return resultados
+
+def _particionar(dominios):
+    pos = max(range(len(dominios)), key=lambda p: dominios[p].bit_count())
+    particiones = []
+    for op in _iterar_bits(dominios[pos]):
+        particion = list(dominios)
+        particion[pos] = 1 << op
+        particiones.append(particion)
+    return particiones
+
+def resolver_horarios_paralelo(secciones, limite=100, procesos=None, indice=None):
+    """
+    Reparte la búsqueda entre procesos fijando, en cada partición, una opción del
+    curso con más opciones. Los resultados se unen en orden de partición y se
+    cortan en `limite`, así que la salida no depende de qué proceso termina antes.
+    """
+    if indice is None:
+        indice = construir_indice_conflictos(agrupar_opciones_por_curso(secciones))
+    procesos = procesos or os.cpu_count() or 1
+    dominios = indice['dominios']
+    if procesos <= 1 or not dominios:
+        return list(islice(resolver_horarios(secciones, indice), limite))
+
+    particiones = _particionar(dominios)
+    encontrados = multiprocessing.Array('i', len(particiones))
+    with ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_trabajador,
+                             initargs=(indice, encontrados)) as executor:
+        futuros = [executor.submit(_resolver_particion, i, particion, limite)
+                   for i, particion in enumerate(particiones)]
+        validos = []
+        encontrados = 0
+        for futuro in futuros:
+            for ids in futuro.result():
+                validos.append(ids)
+                encontrados += peso_asignacion(indice, ids)
+            if encontrados >= limite:
+                executor.shutdown(cancel_futures=True)
+                break
+    return _expandir_hasta(indice, validos, limite)
+
+def mejores_horarios(indice, k=100, dominios=None, estadisticas=None):
+    """
+    Calcula los k horarios de mayor puntaje por branch and bound: guarda los mejores
+    en un heap acotado y poda toda rama cuya cota superior no supera al peor de ellos.
+    Cada asignación de clases cuenta tantas veces como combinaciones concretas
+    representa, y el heap conserva solo las necesarias para cubrir k.
+    La cota suma, por cada curso pendiente, el máximo de (puntos de mañana + sesiones)
+    de sus opciones restantes, ya que cada sesión aporta a lo sumo un punto por
+    separación y la primera de cada día ninguno.
+    Devuelve [(puntaje, ids de clase)] de mejor a peor; los empates quedan en orden
+    de búsqueda. Si se pasa `estadisticas` (dict), suma ahí los nodos visitados y
+    las asignaciones completas evaluadas.
+    """
+    if k <= 0:
+        return []
+    sesiones = indice['sesiones']
+    pesos = indice['pesos']
+    dias = indice['dias']
+    manana = [sum(1 for _, inicio, _ in s if INICIO_MANANA <= inicio < FIN_MANANA) for s in sesiones]
+    cota = [m + len(s) for m, s in zip(manana, sesiones)]
+    if dominios is None:
+        dominios = indice['dominios']
+    asignacion = [None] * len(dominios)
+    mejores = []
+    cubiertos = 0
+    nodos = evaluados = 0
+    orden = count()
+
+    def backtrack(restantes, puntos_manana, n_sesiones, dias_usados):
+        nonlocal cubiertos, nodos, evaluados
+        nodos += 1
+        if cubiertos >= k:
+            optimista = puntos_manana + n_sesiones - dias_usados.bit_count()
+            optimista += sum(max(cota[op] for op in _iterar_bits(d)) for d in restantes.values())
+            if optimista <= mejores[0][0]:
+                return
+        if not restantes:
+            evaluados += 1
+            ids = tuple(asignacion)
+            peso = 1
+            for op in ids:
+                peso *= pesos[op]
+            heapq.heappush(mejores, (puntaje_sesiones([x for op in ids for x in sesiones[op]]),
+                                     -next(orden), ids, peso))
+            cubiertos += peso
+            while cubiertos - mejores[0][3] >= k:
+                cubiertos -= heapq.heappop(mejores)[3]
+            return
+        pos = min(restantes, key=lambda p: restantes[p].bit_count())
+        for op in sorted(_iterar_bits(restantes[pos]), key=lambda op: -cota[op]):
+            filtrados = _propagar(indice, restantes, pos, op, dias_usados)
+            if filtrados is not None:
+                asignacion[pos] = op
+                backtrack(filtrados, puntos_manana + manana[op],
+                          n_sesiones + len(sesiones[op]), dias_usados | dias[op])
+
+    backtrack(dict(enumerate(dominios)), 0, 0, 0)
+    if estadisticas is not None:
+        estadisticas['nodos'] = estadisticas.get('nodos', 0) + nodos
+        estadisticas['evaluados'] = estadisticas.get('evaluados', 0) + evaluados
+    return [(puntaje, ids) for puntaje, _, ids, _ in sorted(mejores, reverse=True)]
+
+def _mejores_particion(particion, dominios, k):
+    estadisticas = {}
+    return mejores_horarios(_indice_trabajador, k, dominios, estadisticas), estadisticas
+
+def resolver_mejores_horarios(secciones, k=100, procesos=None, indice=None, estadisticas=None):
+    """
+    Devuelve los k mejores horarios como [(puntaje, combinación)], de mejor a peor.
+    Con más de un proceso, cada partición calcula su propio top-k y se unen
+    ordenando por puntaje y, en empates, por partición. Las clases se expanden a
+    combinaciones concretas solo hasta completar k.
+    """
+    if indice is None:
+        indice = construir_indice_conflictos(agrupar_opciones_por_curso(secciones))
+    procesos = procesos or os.cpu_count() or 1
+    dominios = indice['dominios']
+    if procesos <= 1 or not dominios:
+        mejores = mejores_horarios(indice, k, estadisticas=estadisticas)
+    else:
+        particiones = _particionar(dominios)
+        encontrados = multiprocessing.Array('i', len(particiones))
+        with ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_trabajador,
+                                 initargs=(indice, encontrados)) as executor:
+            resultados = []
+            for resultado, parciales in executor.map(_mejores_particion, range(len(particiones)),
+                                                     particiones, [k] * len(particiones)):
+                resultados.append(resultado)
+                if estadisticas is not None:
+                    for clave, valor in parciales.items():
+                        estadisticas[clave] = estadisticas.get(clave, 0) + valor
+        candidatos = [(-puntaje, i, j, ids)
+                      for i, resultado in enumerate(resultados)
+                      for j, (puntaje, ids) in enumerate(resultado)]
+        mejores = [(-neg, ids) for neg, _, _, ids in sorted(candidatos)]
+    expandidos = ((puntaje, comb) for puntaje, ids in mejores for comb in expandir_asignacion(indice, ids))
+    return list(islice(expandidos, k))
+
+def aplanar_combinacion(comb):
+    """Un horario es la tupla de secciones elegidas; se comparten, no se copian."""
+    return tuple(sec for grupo in comb for sec in grupo)
 
 
 def is_horario_valido(horario):
-    df = pd.DataFrame(horario).sort_values(['dia', 'hora_inicio'])
-    for dia, grupo in df.groupby('dia'):
-        times = grupo[['hora_inicio', 'hora_fin']].sort_values('hora_inicio')
-        for i in range(1, len(times)):
-            if times.iloc[i]['hora_inicio'] < times.iloc[i-1]['hora_fin']:
-                return False
-    return True
+    return compilar_mascara([sesion for sec in horario for sesion in sec.sesiones]) is not None
 
 def crear_pdf(horario, filename):
     try:
@@ -121,25 +785,20 @@ def crear_pdf(horario, filename):
 
         # Crear tabla semanal
         dias = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado']
-        dias_abreviados = {'LUN': 'Lunes', 'MAR': 'Martes', 'MIE': 'Miércoles',
-                           'JUE': 'Jueves', 'VIE': 'Viernes', 'SAB': 'Sábado'}
 
-        # Convertir días abreviados a completos
-        for entry in horario:
-            entry['dia'] = dias_abreviados.get(entry['dia'], entry['dia'])
-
-        # Obtener horas únicas y ordenadas
-        horas = sorted({h['hora_inicio'] for h in horario}, key=lambda t: t.hour * 60 + t.minute)
+        # Obtener horas únicas y ordenadas (en minutos)
+        horas = sorted({sesion.inicio for sec in horario for sesion in sec.sesiones})
 
         # Crear datos para la tabla
-        data = [[f"{h.strftime('%H:%M')}"] + [""] * len(dias) for h in horas]
+        data = [[f"{minutos_a_hora(h).strftime('%H:%M')}"] + [""] * len(dias) for h in horas]
 
         # Llenar la tabla con los horarios
-        for entry in horario:
-            hora_idx = horas.index(entry['hora_inicio'])
-            dia_idx = dias.index(entry['dia'])
-            info = f"{entry['curso']}\n{entry['id_liga']}\n{entry['docente']}\nNRC: {entry['nrc']}"
-            data[hora_idx][dia_idx + 1] = info  # +1 porque la primera columna es la hora
+        for sec in horario:
+            info = f"{sec.curso}\n{sec.id_liga}\n{sec.docente}\nNRC: {sec.nrc}"
+            for sesion in sec.sesiones:
+                hora_idx = horas.index(sesion.inicio)
+                dia_idx = dias.index(nombre_dia(sesion.dia))
+                data[hora_idx][dia_idx + 1] = info  # +1 porque la primera columna es la hora
 
         # Añadir encabezados de días
         data.insert(0, ["Hora"] + dias)
@@ -189,43 +848,49 @@ def crear_pdf(horario, filename):
         print(f"[-] Error PDF: {str(e)}")
         raise
 
-def extract_course_data(driver, curso_id):
+# XPath del detalle de cursos, compilados una sola vez y evaluados sobre el HTML local
+XPATH_BLOQUES = etree.XPath("//div[contains(@style, 'border-bottom:0px solid #C0C0C0')]")
+XPATH_NRC = etree.XPath("normalize-space(.//td[contains(text(), 'NRC:')]/b)", smart_strings=False)
+XPATH_ID_LIGA = etree.XPath("normalize-space(.//td[contains(text(), 'ID LIGA:')]/b)", smart_strings=False)
+XPATH_DOCENTE = etree.XPath("normalize-space(.//td[@class='e_fila_table4'])", smart_strings=False)
+XPATH_FILAS_HORARIO = etree.XPath(".//tr[contains(@style, 'background:#FFFFFF')]")
+XPATH_CELDAS = etree.XPath(".//td")
+
+def parse_detalle_cursos_html(html, curso_id):
+    """
+    Extrae las secciones del HTML de `id_detalle_cursos` en una sola pasada con lxml,
+    sin ir y volver al navegador por cada NRC, docente o fila de horario.
+    """
     data = []
+    raiz = lxml_html.fromstring(html)
+    for block in XPATH_BLOQUES(raiz):
+        try:
+            nrc = XPATH_NRC(block)
+            id_liga = XPATH_ID_LIGA(block)
+            if not nrc or not id_liga:
+                raise ValueError("bloque sin NRC o ID LIGA")
+            docente = XPATH_DOCENTE(block)
+
+            horarios = []
+            for row in XPATH_FILAS_HORARIO(block):
+                cols = XPATH_CELDAS(row)
+                dia = cols[2].text_content().strip()
+                hora = " ".join(cols[3].text_content().split())
+                parsed = parse_horario(hora)
+                horarios.append(Sesion(dia, _minutos(parsed['inicio']), _minutos(parsed['fin'])))
+
+            data.append(Seccion(curso_id, nrc, id_liga, docente, horarios))
+        except Exception as e:
+            print(f"[-] Error en bloque: {str(e)}")
+    return data
+
+def extract_course_data(driver, curso_id):
     try:
-        WebDriverWait(driver, 20).until(
+        detalle = WebDriverWait(driver, 20).until(
             EC.visibility_of_element_located((By.ID, "id_detalle_cursos"))
         )
-        course_blocks = driver.find_elements(By.XPATH, "//div[contains(@style, 'border-bottom:0px solid #C0C0C0')]")
-        
-        for block in course_blocks:
-            try:
-                nrc = block.find_element(By.XPATH, ".//td[contains(text(), 'NRC:')]/b").text.strip()
-                id_liga = block.find_element(By.XPATH, ".//td[contains(text(), 'ID LIGA:')]/b").text.strip()
-                docente = block.find_element(By.XPATH, ".//td[@class='e_fila_table4']").text.strip()
-                
-                horarios = []
-                schedule_rows = block.find_elements(By.XPATH, ".//tr[contains(@style, 'background:#FFFFFF')]")
-                for row in schedule_rows:
-                    cols = row.find_elements(By.TAG_NAME, "td")
-                    dia = cols[2].text.strip()
-                    hora = cols[3].text.strip()
-                    parsed = parse_horario(hora)
-                    horarios.append({
-                        'dia': dia,
-                        'hora_inicio': parsed['inicio'],
-                        'hora_fin': parsed['fin']
-                    })
-                
-                data.append({
-                    'curso': curso_id,  # Actualizar para múltiples cursos
-                    'nrc': nrc,
-                    'id_liga': id_liga,
-                    'docente': docente,
-                    'horarios': horarios
-                })
-            except Exception as e:
-                print(f"[-] Error en bloque: {str(e)}")
-        return data
+        # Una sola llamada al navegador; el resto se analiza localmente
+        return parse_detalle_cursos_html(detalle.get_attribute("outerHTML"), curso_id)
     except Exception as e:
         print(f"[-] Error extrayendo {curso_id}: {str(e)}")
         return []
@@ -250,19 +915,18 @@ def extract_course_by_id(driver, curso_id):
         if not onclick.startswith('javascript:f_detalle_cursos'):
             raise ValueError(f"[-] Elemento inválido para {curso_id}")
         
-        # Scroll y clic con JavaScript
-        driver.execute_script("""
-            arguments[0].scrollIntoView({block: 'center', behavior: 'smooth'});
-            arguments[0].click();
-        """, curso_row)
-        
-        # Esperar carga del detalle del curso
+        # Scroll y clic con JavaScript; esperar carga del detalle del curso
         try:
-            WebDriverWait(driver, 20).until(
-                EC.visibility_of_element_located(
-                    (By.XPATH, "//div[@id='id_detalle_cursos']//table[contains(@class, 'tabla_3')]")
+            with limitador_portal.peticion():
+                driver.execute_script("""
+                    arguments[0].scrollIntoView({block: 'center', behavior: 'smooth'});
+                    arguments[0].click();
+                """, curso_row)
+                WebDriverWait(driver, 20).until(
+                    EC.visibility_of_element_located(
+                        (By.XPATH, "//div[@id='id_detalle_cursos']//table[contains(@class, 'tabla_3')]")
+                    )
                 )
-            )
         except:
             print(f"[-] Timeout cargando detalle de {curso_id}")
             driver.save_screenshot(f"error_{curso_id}.png")
@@ -271,9 +935,12 @@ def extract_course_by_id(driver, curso_id):
         # Extraer datos
         data = extract_course_data(driver, curso_id)
         
-        # Volver a la lista de cursos
-        driver.execute_script("window.location.href = 'javascript:f_show_three();'")
-        time.sleep(random_delay('navegacion'))
+        # Volver a la lista de cursos y esperar a que vuelva a mostrarse
+        with limitador_portal.peticion():
+            driver.execute_script("window.location.href = 'javascript:f_show_three();'")
+            WebDriverWait(driver, 20).until(
+                EC.visibility_of_element_located((By.XPATH, "//td[contains(@onclick, 'f_detalle_cursos')]"))
+            )
         
         return data
 
@@ -282,39 +949,143 @@ def extract_course_by_id(driver, curso_id):
         return []
     
 def abrir_login_y_guardar_captcha(user, password, base_url):
-    driver = setup_chrome()
-    driver.get(base_url)
-    form = WebDriverWait(driver, 20).until(
-        EC.presence_of_element_located((By.XPATH, "//table[.//input[@placeholder='usuario']]"))
-    )
-    form.find_element(By.XPATH, ".//input[@placeholder='usuario']").send_keys(user)
-    form.find_element(By.XPATH, ".//input[@placeholder='contraseña']").send_keys(password)
-    captcha = form.find_element(By.ID, "imgCaptcha")
-    captcha_path = "captcha.png"
-    captcha.screenshot(captcha_path)
+    with tramo("login.navegador"):
+        driver = tomar_driver_login()
+    try:
+        with tramo("login.captcha"):
+            driver.get(base_url)
+        form = WebDriverWait(driver, 20).until(
+            EC.presence_of_element_located((By.XPATH, "//table[.//input[@placeholder='usuario']]"))
+        )
+        form.find_element(By.XPATH, ".//input[@placeholder='usuario']").send_keys(user)
+        form.find_element(By.XPATH, ".//input[@placeholder='contraseña']").send_keys(password)
+        captcha = form.find_element(By.ID, "imgCaptcha")
+        captcha_path = "captcha.png"
+        captcha.screenshot(captcha_path)
+    except Exception:
+        liberar_driver(driver)
+        raise
     # NO hagas nada más aquí, no recargues ni cambies de página
     return driver, captcha_path
 
 def login_and_navigate(driver, captcha_code, base_horarios):
+    if not mantener_driver(driver):
+        minutos = pool_navegadores().max_prestamo / 60
+        raise RuntimeError(f"El captcha venció (pasaron más de {minutos:.0f} min desde el paso 1); "
+                           "pide uno nuevo en el paso 1.")
     # Usa el mismo driver y DOM, solo llena el captcha y haz click
     form = driver.find_element(By.XPATH, "//table[.//input[@placeholder='usuario']]")
     form.find_element(By.ID, "txt_img").send_keys(captcha_code)
-    form.find_element(By.ID, "btn_valida").click()
-    time.sleep(random_delay('navegacion'))
-
-    driver.get(base_horarios)
-    pregrado = WebDriverWait(driver, 20).until(
-        EC.element_to_be_clickable((By.XPATH, "//a[contains(text(), 'Horarios de clase pregrado')]"))
-    )
-    pregrado.click()
-    time.sleep(random_delay('carga'))
-
-    isia = driver.find_element(By.XPATH, "//td[contains(text(), 'ISIA')]/following-sibling::td[1]")
-    driver.execute_script("arguments[0].click();", isia)
-    time.sleep(random_delay('carga'))
+    with tramo("login"), limitador_portal.peticion():
+        form.find_element(By.ID, "btn_valida").click()
+        esperar_cambio_de_pagina(driver, form)
+
+    with tramo("navegacion"):
+        with limitador_portal.peticion():
+            driver.get(base_horarios)
+            pregrado = WebDriverWait(driver, 20).until(
+                EC.element_to_be_clickable((By.XPATH, "//a[contains(text(), 'Horarios de clase pregrado')]"))
+            )
+
+        with limitador_portal.peticion():
+            pregrado.click()
+            isia = WebDriverWait(driver, 20).until(
+                EC.presence_of_element_located((By.XPATH, "//td[contains(text(), 'ISIA')]/following-sibling::td[1]"))
+            )
+
+        with limitador_portal.peticion():
+            driver.execute_script("arguments[0].click();", isia)
+            WebDriverWait(driver, 20).until(
+                EC.visibility_of_element_located((By.XPATH, "//td[contains(@onclick, 'f_detalle_cursos')]"))
+            )
     return driver
 
-def run_horario_scraper(user, password, curso_ids, base_url, base_horarios, driver):
+# Descarga directa del detalle de cursos: tras el login, las cookies de Selenium pasan
+# a una sesión HTTP y los detalles se piden en paralelo, sin clics en el navegador.
+# DETALLE_CURSOS_URL es el endpoint al que llama f_detalle_cursos y
+# DETALLE_CURSOS_PARAMS los nombres de sus argumentos, separados por coma y en orden.
+DETALLE_CURSOS_CONCURRENCIA = 4
+
+def crear_sesion_http(driver, conexiones=DETALLE_CURSOS_CONCURRENCIA):
+    """Sesión requests con pool de conexiones que reutiliza las cookies del navegador."""
+    sesion = requests.Session()
+    adaptador = HTTPAdapter(pool_connections=conexiones, pool_maxsize=conexiones,
+                            max_retries=Retry(total=2, backoff_factor=0.5, status_forcelist=[502, 503, 504]))
+    sesion.mount("http://", adaptador)
+    sesion.mount("https://", adaptador)
+    sesion.headers["User-Agent"] = driver.execute_script("return navigator.userAgent;")
+    sesion.headers["Referer"] = driver.current_url
+    for cookie in driver.get_cookies():
+        sesion.cookies.set(cookie['name'], cookie['value'],
+                           domain=cookie.get('domain'), path=cookie.get('path', '/'))
+    return sesion
+
+def argumentos_detalle_cursos(driver):
+    """Lee en una sola llamada los argumentos de f_detalle_cursos(...) de cada curso listado."""
+    filas = driver.execute_script("""
+        return Array.from(document.querySelectorAll("td[onclick*='f_detalle_cursos']")).map(td => [
+            (td.querySelector('span.letra') || td).textContent.trim(), td.getAttribute('onclick')]);
+    """)
+    argumentos = {}
+    for curso_id, onclick in filas:
+        llamada = re.search(r"f_detalle_cursos\((.*?)\)", onclick or "")
+        if llamada:
+            argumentos[curso_id] = [''.join(partes) for partes in
+                                    re.findall(r"'([^']*)'|\"([^\"]*)\"|([^,\s'\"]+)", llamada.group(1))]
+    return argumentos
+
+def descargar_detalle_curso(sesion, url, nombres, argumentos, curso_id):
+    with limitador_portal.peticion():
+        respuesta = sesion.post(url, data=dict(zip(nombres, argumentos)), timeout=20)
+        respuesta.raise_for_status()
+    return parse_detalle_cursos_html(respuesta.text, curso_id)
+
+def descargar_detalles_cursos(driver, curso_ids, url, nombres, concurrencia=DETALLE_CURSOS_CONCURRENCIA):
+    """
+    Descarga y analiza el detalle de varios cursos a la vez (como mucho `concurrencia`
+    peticiones en curso). Devuelve {curso_id: secciones}; los cursos que fallan o
+    vuelven vacíos no aparecen, para que se extraigan con el navegador.
+    """
+    argumentos = argumentos_detalle_cursos(driver)
+    sesion = crear_sesion_http(driver, concurrencia)
+    resultados = {}
+    try:
+        with ThreadPoolExecutor(max_workers=concurrencia) as executor:
+            futuros = {}
+            for curso_id in curso_ids:
+                if curso_id not in argumentos:
+                    print(f"[-] {curso_id} no aparece en la lista de cursos")
+                    continue
+                futuros[executor.submit(descargar_detalle_curso, sesion, url, nombres,
+                                        argumentos[curso_id], curso_id)] = curso_id
+            for futuro in as_completed(futuros):
+                curso_id = futuros[futuro]
+                try:
+                    secciones = futuro.result()
+                except Exception as e:
+                    print(f"[-] Error descargando {curso_id}: {str(e)}")
+                    continue
+                if secciones:
+                    resultados[curso_id] = secciones
+                    print(f"[+] {curso_id}: {len(secciones)} secciones descargadas")
+                else:
+                    print(f"[-] {curso_id}: respuesta sin secciones")
+    finally:
+        sesion.close()
+    return resultados
+
+def _nota_avisos(avisos):
+    return f" Aviso: {'; '.join(avisos)}." if avisos else ""
+
+# Horarios que se generan (los mejores por puntaje) y segundos que puede tardar la
+# cuenta exacta del total; si no termina, se informa una cota inferior
+HORARIOS_A_GENERAR = 100
+LIMITE_CONTEO = 5
+
+NAVEGADOR_VENCIDO = "El navegador estuvo inactivo demasiado tiempo y se cerró; vuelve a empezar desde el paso 1."
+
+def run_horario_scraper(user, password, curso_ids, base_url, base_horarios, driver, procesos=None,
+                        restricciones=None):
     PDF_FOLDER = "horarios_generados"
     os.makedirs(PDF_FOLDER, exist_ok=True)
     DATA_FOLDER = "data-horarios"
@@ -323,74 +1094,149 @@ def run_horario_scraper(user, password, curso_ids, base_url, base_horarios, driv
     os.makedirs(CSV_FOLDER, exist_ok=True)
 
     all_secciones = []
-    validos = []
+    if procesos is None:
+        procesos = int(os.getenv("HORARIOS_PROCESOS", "1"))
 
     try:
+        ids_validos = []
         for curso_id in curso_ids:
             if not re.match(r'^[A-Z]{4}-\d{3}$', curso_id):
                 print(f"[-] ID inválido: {curso_id}")
                 continue
+            ids_validos.append(curso_id)
+        cache = CacheSecciones(ttl=int(os.getenv("HORARIOS_CACHE_TTL", TTL_POR_DEFECTO)))
+        en_cache = {}
+        for curso_id in ids_validos:
+            secciones = cache.obtener(curso_id)
+            if secciones:
+                en_cache[curso_id] = secciones
+        pendientes = [curso_id for curso_id in ids_validos if curso_id not in en_cache]
+        print(f"[+] {len(en_cache)} cursos desde caché, {len(pendientes)} por descargar")
+        descargados = {}
+        url_detalle = os.getenv("DETALLE_CURSOS_URL")
+        if url_detalle and pendientes:
+            if not mantener_driver(driver):
+                raise RuntimeError(NAVEGADOR_VENCIDO)
+            nombres = [n.strip() for n in os.getenv("DETALLE_CURSOS_PARAMS", "").split(",") if n.strip()]
+            concurrencia = int(os.getenv("DETALLE_CURSOS_CONCURRENCIA", DETALLE_CURSOS_CONCURRENCIA))
+            print(f"[+] Descargando {len(pendientes)} cursos por HTTP ({concurrencia} a la vez)")
+            with tramo("extraccion.http", cursos=len(pendientes)) as t:
+                descargados = descargar_detalles_cursos(driver, pendientes, url_detalle, nombres, concurrencia)
+                t.contar("cursos_descargados", len(descargados))
+        for curso_id in ids_validos:
             print(f"\n[+] Procesando curso: {curso_id}")
-            curso_data = extract_course_by_id(driver, curso_id)
+            with tramo("extraccion.curso", curso=curso_id) as t:
+                if curso_id in en_cache:
+                    t.atributos['origen'] = "cache"
+                    curso_data = en_cache[curso_id]
+                    print(f"[+] {curso_id} tomado de la caché (descargado hace {cache.edad(curso_id) / 60:.0f} min)")
+                else:
+                    t.atributos['origen'] = "http" if curso_id in descargados else "navegador"
+                    if curso_id not in descargados and not mantener_driver(driver):
+                        raise RuntimeError(NAVEGADOR_VENCIDO)
+                    curso_data = descargados.get(curso_id) or extract_course_by_id(driver, curso_id)
+                    if curso_data and not cache.guardar(curso_id, curso_data):
+                        print(f"[+] {curso_id} sin cambios desde la última descarga")
+                t.contar("secciones", len(curso_data))
             if curso_data:
                 all_secciones.extend(curso_data)
                 json_path = os.path.join(DATA_FOLDER, f"{curso_id}.json")
                 with open(json_path, "w", encoding="utf-8") as f:
-                    json.dump(curso_data, f, ensure_ascii=False, indent=2, default=str)
+                    json.dump([sec.a_dict() for sec in curso_data], f, ensure_ascii=False, indent=2)
                 print(f"[+] Datos de {curso_id} guardados en {json_path}")
-        combinaciones = generar_combinaciones_todos_cursos(all_secciones)
-        print(f"[+] {len(combinaciones)} combinaciones encontradas")
-        for comb in combinaciones:
-            horario = []
-            for grupo in comb:
-                for sec in grupo:
-                    for h in sec['horarios']:
-                        horario.append({
-                            'curso': sec['curso'],
-                            'id_liga': sec['id_liga'],
-                            'nrc': sec['nrc'],
-                            'dia': h['dia'],
-                            'hora_inicio': h['hora_inicio'],
-                            'hora_fin': h['hora_fin'],
-                            'docente': sec['docente']
-                        })
-            if is_horario_valido(horario):
-                validos.append(horario)
-                if len(validos) >= 100:
-                    break
+        # La búsqueda no usa el navegador: se devuelve ya para que otra sesión lo aproveche
+        liberar_driver(driver)
+        driver = None
+        if not all_secciones:
+            return False, "No hay horarios válidos: no se obtuvieron secciones de ningún curso."
+        avisos = []
+        with tramo("combinaciones", secciones=len(all_secciones)) as t:
+            combinaciones_por_curso = agrupar_opciones_por_curso(all_secciones)
+            total_combinaciones = contar_combinaciones(combinaciones_por_curso)
+            print(f"[+] {total_combinaciones} combinaciones encontradas")
+            t.contar("combinaciones", total_combinaciones)
+            if restricciones:
+                combinaciones_por_curso = filtrar_opciones(combinaciones_por_curso, restricciones, avisos)
+                total_combinaciones = contar_combinaciones(combinaciones_por_curso)
+                print(f"[+] {total_combinaciones} combinaciones cumplen las preferencias")
+                t.contar("combinaciones_con_preferencias", total_combinaciones)
+            indice = construir_indice_conflictos(combinaciones_por_curso, (restricciones or {}).get('max_dias'))
+            total_opciones = sum(len(opciones) for opciones in combinaciones_por_curso.values())
+            print(f"[+] {total_opciones} grupos de liga agrupados en {len(indice['clases'])} clases de horario")
+            t.contar("grupos_de_liga", total_opciones)
+            t.contar("clases", len(indice['clases']))
+        with tramo("validacion"):
+            imposibles = diagnosticar_imposibles(indice)
+        if imposibles:
+            for mensaje in imposibles:
+                print(f"[-] {mensaje}")
+            return False, "No existe ningún horario válido: " + "; ".join(imposibles + avisos)
+        with tramo("busqueda", procesos=procesos) as t:
+            mejores = resolver_mejores_horarios(all_secciones, HORARIOS_A_GENERAR, procesos, indice, t.contadores)
+            validos = [aplanar_combinacion(comb) for _, comb in mejores]
+            t.contar("horarios", len(validos))
+        if not mejores:
+            print("[-] No hay horarios válidos")
+            if restricciones:
+                return False, "No hay horarios válidos con las preferencias indicadas; prueba a relajarlas." + _nota_avisos(avisos)
+            return False, "No hay horarios válidos: todas las combinaciones de secciones tienen cruces."
         print(f"[+] {len(validos)} horarios válidos generados")
-        for i, horario in enumerate(validos[:20]):
-            filename = os.path.join(PDF_FOLDER, f"horario_valido_{i+1}.pdf")
-            crear_pdf(horario, filename)
+        print(f"[+] Mejor puntaje: {mejores[0][0]}")
+        # La cuenta del total va después de la búsqueda: si esta no llenó el cupo, ya
+        # encontró todos; si no, se cuenta con tiempo límite
+        with tramo("conteo") as t:
+            total_validos, exacto = len(mejores), True
+            if len(mejores) >= HORARIOS_A_GENERAR:
+                try:
+                    total_validos = contar_horarios_validos(
+                        all_secciones, indice, float(os.getenv("HORARIOS_LIMITE_CONTEO", LIMITE_CONTEO)))
+                except CuentaIncompleta as e:
+                    total_validos, exacto = max(e.minimo, len(mejores)), False
+            t.contar("horarios_validos", total_validos)
+            t.atributos['exacto'] = exacto
+        total_texto = str(total_validos) if exacto else f"al menos {total_validos}"
+        print(f"[+] {total_texto} horarios válidos posibles")
+        with tramo("pdf") as t:
+            for i, horario in enumerate(validos[:20]):
+                filename = os.path.join(PDF_FOLDER, f"horario_valido_{i+1}.pdf")
+                crear_pdf(horario, filename)
+                t.contar("pdfs")
         csv_filename = os.path.join(CSV_FOLDER, "horarios_validos.csv")
-        guardar_horarios_csv(validos, csv_filename)
-        return True, f"Proceso completado. PDFs y CSV generados en las carpetas correspondientes."
+        with tramo("csv") as t:
+            guardar_horarios_csv(validos, csv_filename)
+            t.contar("horarios", len(validos))
+        with tramo("puntaje"):
+            puntuar_csv(csv_filename)
+        return True, (f"Proceso completado. Existen {total_texto} horarios válidos; PDFs y CSV generados "
+                      f"en las carpetas correspondientes." + _nota_avisos(avisos))
     except Exception as e:
         print(f"[-] Error crítico: {str(e)}")
         return False, str(e)
     finally:
-        if driver and hasattr(driver, "quit"):
-            driver.quit()
+        liberar_driver(driver)
+
+COLUMNAS_CSV = ['#horario', 'Curso', 'ID Liga', 'NRC', 'Día', 'Hora Inicio', 'Hora Fin', 'Docente']
 
 def guardar_horarios_csv(horarios, filename):
     try:
         # Crear una lista de diccionarios para cada entrada de horario
         rows = []
         for idx, horario in enumerate(horarios, start=1):
-            for entry in horario:
-                rows.append({
-                    '#horario': idx,
-                    'Curso': entry['curso'],
-                    'ID Liga': entry['id_liga'],
-                    'NRC': entry['nrc'],
-                    'Día': entry['dia'],
-                    'Hora Inicio': entry['hora_inicio'].strftime('%H:%M'),
-                    'Hora Fin': entry['hora_fin'].strftime('%H:%M'),
-                    'Docente': entry['docente']
-                })
+            for sec in horario:
+                for sesion in sec.sesiones:
+                    rows.append({
+                        '#horario': idx,
+                        'Curso': sec.curso,
+                        'ID Liga': sec.id_liga,
+                        'NRC': sec.nrc,
+                        'Día': nombre_dia(sesion.dia),
+                        'Hora Inicio': sesion.hora_inicio.strftime('%H:%M'),
+                        'Hora Fin': sesion.hora_fin.strftime('%H:%M'),
+                        'Docente': sec.docente
+                    })
         
-        # Crear un DataFrame y exportarlo a CSV
-        df = pd.DataFrame(rows)
+        # Crear un DataFrame y exportarlo a CSV (con encabezados aunque no haya horarios)
+        df = pd.DataFrame(rows, columns=COLUMNAS_CSV)
         df.to_csv(filename, index=False, encoding='utf-8-sig')
         print(f"[+] Horarios guardados en {filename}")
     except Exception as e:
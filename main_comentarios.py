@@ -1,28 +1,52 @@
 import requests
 from bs4 import BeautifulSoup
 import json
-import time
 from urllib.parse import urljoin, quote_plus
 import unicodedata
 from urllib.parse import urlparse, parse_qs
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from bs4 import BeautifulSoup
-import time
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException
 import os
+import hashlib
+import sqlite3
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from limitador import Limitador
+from pool_chrome import pool_global
+from archivos import actualizar_json_atomico
+from almacen_comentarios import AlmacenComentarios, RUTA_EXPORTACION
+from coincidencia_nombres import IndiceNombres
+from cache_perfiles import CachePerfiles, TTL_PERFILES, TTL_SIN_PERFIL
+from instrumentacion import tramo
 
+MISPROFESORES_URL = os.getenv("MISPROFESORES_URL", "https://peru.misprofesores.com").rstrip("/")
 
-def buscar_url_perfil(nombre_completo, _):
-    """
-    Busca el perfil usando Selenium y devuelve tanto la URL como el nombre real del perfil.
-    """
-    query = quote_plus(nombre_completo)
-    url_busqueda = f"https://peru.misprofesores.com/Buscar?q={query}"
+# Compartido por la búsqueda de perfiles y la paginación de comentarios
+limitador_misprofesores = Limitador(tasa=float(os.getenv("MISPROFESORES_PETICIONES_POR_SEGUNDO", "1")),
+                                    rafaga=2, nombre="misprofesores")
+# Docentes procesados a la vez; las búsquedas además esperan turno en el pool de Chrome
+MISPROFESORES_CONCURRENCIA = 4
+# Páginas de comentarios pedidas por adelantado mientras se procesa la actual
+MISPROFESORES_PREFETCH = 2
+
+# Estado del recorrido incremental: por perfil, huellas de sus comentarios más recientes
+ESTADO_CRAWL = os.path.join("comentarios", "estado_crawl.json")
+MARCADORES_POR_PERFIL = 10
+
+_sesion_http = None
+_cache_perfiles = None
+_lock_sesion = threading.Lock()
 
-    print(f"[*] Buscando con Selenium: {url_busqueda}")
 
+def crear_driver_busqueda():
     options = Options()
     options.add_argument("--headless=new")
     options.add_argument("--disable-gpu")
@@ -31,15 +55,52 @@ def buscar_url_perfil(nombre_completo, _):
     options.add_argument("--log-level=3")
 
     service = Service(log_path=os.devnull)
-    driver = webdriver.Chrome(service=service, options=options)
+    return webdriver.Chrome(service=service, options=options)
 
-    try:
-        driver.get(url_busqueda)
-        time.sleep(3)
+def cache_perfiles():
+    global _cache_perfiles
+    with _lock_sesion:
+        if _cache_perfiles is None:
+            _cache_perfiles = CachePerfiles(
+                ttl=int(os.getenv("MISPROFESORES_PERFILES_TTL", TTL_PERFILES)),
+                ttl_sin_perfil=int(os.getenv("MISPROFESORES_SIN_PERFIL_TTL", TTL_SIN_PERFIL))
+            )
+        return _cache_perfiles
+
+def buscar_url_perfil(nombre_completo, _):
+    """
+    Busca el perfil usando Selenium y devuelve tanto la URL como el nombre real del perfil.
+    El navegador sale de un pool, así que no se abre un Chrome nuevo por docente, y los
+    docentes ya resueltos (o sin perfil) se toman de la caché sin abrirlo.
+    """
+    guardado = cache_perfiles().obtener(nombre_completo)
+    if guardado is not None:
+        print(f"[+] Perfil de {nombre_completo} tomado de la caché: {guardado[0] or 'sin perfil'}")
+        return guardado
+
+    query = quote_plus(nombre_completo)
+    url_busqueda = f"{MISPROFESORES_URL}/Buscar?q={query}"
+
+    print(f"[*] Buscando con Selenium: {url_busqueda}")
+
+    with tramo("perfil.busqueda", docente=nombre_completo) as t, \
+            pool_global("misprofesores", crear_driver_busqueda).prestado() as driver:
+        # Los resultados los carga el buscador por JavaScript: esperar a que aparezcan
+        with limitador_misprofesores.peticion():
+            driver.get(url_busqueda)
+            cargaron = True
+            try:
+                WebDriverWait(driver, 10).until(
+                    lambda d: d.find_elements(By.CSS_SELECTOR, "a.gs-title, .gs-no-results-result")
+                )
+            except TimeoutException:
+                cargaron = False
+                print("[!] Los resultados de búsqueda no cargaron a tiempo.")
 
         soup = BeautifulSoup(driver.page_source, 'html.parser')
         resultados = soup.find_all('a', class_='gs-title')
-        tokens = nombre_completo.lower().split()
+        t.contar("resultados", len(resultados))
+        perfiles = {}
 
         for link in resultados:
             texto = link.get_text(separator=' ', strip=True)
@@ -56,113 +117,244 @@ def buscar_url_perfil(nombre_completo, _):
             if not real_url:
                 continue
 
-            coincidencias = sum(1 for token in tokens if token in texto.lower().replace('-', ' '))
-            if coincidencias >= 2:
-                print(f"[+] Coincidencia con {coincidencias} tokens: {texto}")
-                print(f"[+] URL de perfil: {real_url}")
-                nombre_limpio = texto.split(" - ")[0].strip()
-                return real_url, nombre_limpio
+            perfiles.setdefault(texto.split(" - ")[0].strip(), real_url)
+
+        # El resultado que más palabras comparte con el docente (al menos dos), no el primero
+        nombre_limpio = IndiceNombres(perfiles).buscar(nombre_completo, estricto=False)
+        if nombre_limpio:
+            real_url = perfiles[nombre_limpio]
+            print(f"[+] Coincidencia: {nombre_limpio}")
+            print(f"[+] URL de perfil: {real_url}")
+            t.contar("encontrados")
+            cache_perfiles().guardar(nombre_completo, real_url, nombre_limpio)
+            return real_url, nombre_limpio
 
         print("[!] No se encontraron coincidencias.")
+        if cargaron:  # un timeout no prueba que el docente no tenga perfil
+            cache_perfiles().guardar(nombre_completo, None, None)
         return None, None
 
-    finally:
-        driver.quit()
+def sesion_misprofesores():
+    """Sesión requests compartida: conexiones keep-alive reutilizadas y reintentos con espera creciente."""
+    global _sesion_http
+    with _lock_sesion:
+        if _sesion_http is None:
+            conexiones = MISPROFESORES_CONCURRENCIA * (MISPROFESORES_PREFETCH + 1)
+            _sesion_http = requests.Session()
+            adaptador = HTTPAdapter(pool_connections=conexiones, pool_maxsize=conexiones,
+                                    max_retries=Retry(total=3, backoff_factor=0.5,
+                                                      status_forcelist=[429, 500, 502, 503, 504]))
+            _sesion_http.mount("http://", adaptador)
+            _sesion_http.mount("https://", adaptador)
+        return _sesion_http
+
+def descargar_pagina(sesion, url, cabeceras):
+    with limitador_misprofesores.peticion():
+        response = sesion.get(url, headers=cabeceras, timeout=20)
+        response.raise_for_status()
+    return response.text
+
+def leer_pagina_comentarios(html, url):
+    """Comentarios de la página y URLs de las páginas que siguen a la actual, en orden."""
+    soup = BeautifulSoup(html, 'html.parser')
+    comentarios = [tag.get_text(strip=True) for tag in soup.find_all('p', class_='commentsParagraph')]
+    siguientes = []
+    pagination_ul = soup.find('ul', class_='pagination')
+    active_li = pagination_ul.find('li', class_='active') if pagination_ul else None
+    if active_li:
+        for li in active_li.find_next_siblings('li'):
+            enlace = li.find('a')
+            if enlace and enlace.has_attr('href'):
+                siguientes.append(urljoin(url, enlace['href']))
+    return comentarios, siguientes
 
-def extraer_comentarios_con_paginacion(start_url, cabeceras):
+def iterar_comentarios(start_url, cabeceras, prefetch=None, estadisticas=None):
     """
-    Recorre la paginación de un sitio para extraer todos los comentarios.
-    (Esta función no cambia respecto a la versión anterior)
+    Genera los comentarios de un perfil página por página, sin esperar a tener todos.
+    Mientras se procesa una página, las `prefetch` siguientes que ya aparecen en la
+    paginación se piden por adelantado. Si se pasa `estadisticas` (dict), suma ahí las
+    páginas y comentarios leídos.
     """
-    todos_los_comentarios = []
-    url_actual = start_url
-
-    while url_actual:
-        print(f"[*] Haciendo scraping en la página: {url_actual}")
-        try:
-            response = requests.get(url_actual, headers=cabeceras)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-            comentarios_tags = soup.find_all('p', class_='commentsParagraph')
-            comentarios_pagina = [tag.get_text(strip=True) for tag in comentarios_tags]
-            
+    sesion = sesion_misprofesores()
+    prefetch = int(os.getenv("MISPROFESORES_PREFETCH", MISPROFESORES_PREFETCH)) if prefetch is None else prefetch
+    estadisticas = {} if estadisticas is None else estadisticas
+    adelantadas = {}
+    executor = ThreadPoolExecutor(max_workers=max(1, prefetch))
+    try:
+        url_actual = start_url
+        while url_actual:
+            print(f"[*] Haciendo scraping en la página: {url_actual}")
+            futuro = adelantadas.pop(url_actual, None)
+            try:
+                html = futuro.result() if futuro else descargar_pagina(sesion, url_actual, cabeceras)
+            except requests.exceptions.RequestException as e:
+                print(f"[ERROR] Ocurrió un error en la petición a {url_actual}: {e}")
+                estadisticas['errores'] = estadisticas.get('errores', 0) + 1
+                break
+            comentarios_pagina, siguientes = leer_pagina_comentarios(html, url_actual)
+            for url in siguientes[:prefetch]:
+                if url not in adelantadas:
+                    adelantadas[url] = executor.submit(descargar_pagina, sesion, url, cabeceras)
+            estadisticas['paginas'] = estadisticas.get('paginas', 0) + 1
             if comentarios_pagina:
                 print(f"[+] Se encontraron {len(comentarios_pagina)} comentarios en esta página.")
-                todos_los_comentarios.extend(comentarios_pagina)
+                estadisticas['comentarios'] = estadisticas.get('comentarios', 0) + len(comentarios_pagina)
+                yield from comentarios_pagina
             else:
                 print("[!] No se encontraron comentarios en esta página.")
-
-            siguiente_url = None
-            pagination_ul = soup.find('ul', class_='pagination')
-            if pagination_ul:
-                active_li = pagination_ul.find('li', class_='active')
-                if active_li:
-                    next_li = active_li.find_next_sibling('li')
-                    if next_li and next_li.find('a') and next_li.find('a').has_attr('href'):
-                        href = next_li.find('a')['href']
-                        siguiente_url = urljoin(url_actual, href)
-                        print(f"[*] Página siguiente encontrada: {siguiente_url}")
-            
-            url_actual = siguiente_url
+            url_actual = siguientes[0] if siguientes else None
             if url_actual:
-                time.sleep(1)
-        except requests.exceptions.RequestException as e:
-            print(f"[ERROR] Ocurrió un error en la petición a {url_actual}: {e}")
-            break
-    return todos_los_comentarios
+                print(f"[*] Página siguiente encontrada: {url_actual}")
+    finally:
+        # Si se deja de consumir a mitad, no seguir pidiendo páginas que nadie va a leer
+        for futuro in adelantadas.values():
+            futuro.cancel()
+        executor.shutdown(wait=False)
+
+def huella_comentario(comentario):
+    return hashlib.sha1(" ".join(comentario.lower().split()).encode('utf-8')).hexdigest()[:16]
+
+def es_marcador(comentario):
+    """Los textos genéricos (vacíos o en revisión) se repiten y no sirven para reconocer dónde se quedó."""
+    texto = comentario.strip().lower()
+    return bool(texto) and "comentario esperando revisión" not in texto
 
-def guardar_en_json_unico(datos, nombre_docente, nombre_archivo='comentarios.json'):
+def iterar_comentarios_nuevos(start_url, cabeceras, marcadores, estadisticas=None):
     """
-    Guarda comentarios de varios docentes en un solo archivo JSON de forma acumulativa.
-    Cada docente tiene su propia sección y se evita duplicar comentarios.
+    Como iterar_comentarios, pero se detiene al llegar a lo ya guardado: los perfiles
+    listan primero los comentarios más recientes, así que cuando aparecen seguidos los
+    que se vieron primero la vez anterior (`marcadores`), el resto ya se conoce.
+    """
+    conocidos = set(marcadores)
+    necesarios = min(2, len(conocidos))  # dos seguidos, para no cortar por un texto repetido
+    seguidos = 0
+    # Sin páginas adelantadas: lo normal es terminar en la primera
+    comentarios = iterar_comentarios(start_url, cabeceras, prefetch=0, estadisticas=estadisticas)
+    try:
+        for comentario in comentarios:
+            if huella_comentario(comentario) in conocidos:
+                seguidos += 1
+                if seguidos >= necesarios:
+                    print("[+] Se llegó a comentarios ya guardados, se deja de paginar.")
+                    return
+                continue
+            seguidos = 0
+            yield comentario
+    finally:
+        comentarios.close()
+
+def extraer_comentarios_con_paginacion(start_url, cabeceras, marcadores=None, estadisticas=None):
+    """
+    Recorre la paginación de un perfil y devuelve sus comentarios en una lista. Con
+    `marcadores` solo devuelve los publicados desde el recorrido anterior.
+    """
+    with tramo("comentarios.paginacion", perfil=start_url, incremental=bool(marcadores)) as t:
+        if marcadores:
+            comentarios = list(iterar_comentarios_nuevos(start_url, cabeceras, marcadores, t.contadores))
+        else:
+            comentarios = list(iterar_comentarios(start_url, cabeceras, estadisticas=t.contadores))
+    if estadisticas is not None:
+        estadisticas.update(t.contadores)
+    return comentarios
+
+def cargar_estado_crawl(ruta=ESTADO_CRAWL):
+    if not os.path.exists(ruta):
+        return {}
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"[!] Estado del recorrido ilegible, se recorre todo: {e}")
+        return {}
+
+def guardar_estado_crawl(estado, url_perfil, ruta=ESTADO_CRAWL):
+    """
+    Guarda solo la entrada de `url_perfil`, mezclándola con el archivo bajo un cerrojo:
+    otro recorrido en paralelo no pierde los perfiles que haya actualizado.
+    """
+    actualizar_json_atomico(ruta, lambda datos: datos.update({url_perfil: estado[url_perfil]}))
+
+def actualizar_estado_perfil(estado, url_perfil, nombre_docente, comentarios_nuevos):
+    """Los marcadores pasan a ser los comentarios más recientes: los nuevos y luego los anteriores."""
+    anteriores = estado.get(url_perfil, {}).get('marcadores', [])
+    marcadores = [huella_comentario(c) for c in comentarios_nuevos if es_marcador(c)]
+    marcadores = list(dict.fromkeys(marcadores + anteriores))[:MARCADORES_POR_PERFIL]
+    estado[url_perfil] = {
+        'docente': nombre_docente,
+        'marcadores': marcadores,
+        'actualizado': datetime.now().isoformat(timespec='seconds')
+    }
+
+def guardar_comentarios(almacen, datos, nombre_docente):
+    """
+    Añade los comentarios del docente al almacén (una transacción, sin duplicados).
     """
     if not datos:
         print("[!] No hay datos para guardar.")
         return
 
-    # Crear carpeta si no existe
-    carpeta = "comentarios"
-    os.makedirs(carpeta, exist_ok=True)
-    ruta_archivo = os.path.join(carpeta, nombre_archivo)
-
-    # Filtrar comentarios válidos
-    comentarios_validos = []
-    omitidos = 0
-    for comentario in datos:
-        texto = comentario.strip().lower()
-        if not texto or "comentario esperando revisión" in texto:
-            omitidos += 1
-        else:
-            comentario_limpio = comentario.replace("\r", " ").replace("\n", " ").strip()
-            comentarios_validos.append(comentario_limpio)
-
-    # Cargar datos existentes
-    if os.path.exists(ruta_archivo):
-        with open(ruta_archivo, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    else:
-        data = {}
-
-    # Si el docente ya existe, extender sin duplicar
-    if nombre_docente in data:
-        comentarios_anteriores = set(data[nombre_docente]["comentarios"])
-    else:
-        data[nombre_docente] = {"comentarios": []}
-        comentarios_anteriores = set()
-
-    nuevos_comentarios = [c for c in comentarios_validos if c not in comentarios_anteriores]
-    data[nombre_docente]["comentarios"].extend(nuevos_comentarios)
-    data[nombre_docente]["total_comentarios"] = len(data[nombre_docente]["comentarios"])
-
     try:
-        with open(ruta_archivo, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
-        print(f"\n[SUCCESS] Comentarios guardados en '{ruta_archivo}'")
+        anadidos, omitidos = almacen.agregar(nombre_docente, datos)
+        print(f"\n[SUCCESS] Comentarios guardados en '{almacen.ruta}'")
         print(f"[INFO] Docente: {nombre_docente}")
-        print(f"[INFO] Comentarios añadidos: {len(nuevos_comentarios)}")
+        print(f"[INFO] Comentarios añadidos: {anadidos}")
         print(f"[INFO] Comentarios omitidos (revisión o duplicados): {omitidos}")
-    except IOError as e:
-        print(f"[ERROR] No se pudo guardar el archivo '{ruta_archivo}': {e}")
+    except sqlite3.Error as e:
+        print(f"[ERROR] No se pudo guardar en '{almacen.ruta}': {e}")
+
+def procesar_docente(nombre_docente, cabeceras, marcadores_por_perfil=None):
+    """
+    Busca el perfil del docente y descarga sus comentarios (solo los nuevos si el perfil
+    tiene marcadores). Devuelve (url_perfil, nombre_real, comentarios, completo), donde
+    completo es False si la paginación se cortó por un error.
+    """
+    with tramo("comentarios.docente", docente=nombre_docente):
+        url_del_perfil, nombre_docente_real = buscar_url_perfil(nombre_docente, cabeceras)
+        if not url_del_perfil:
+            print(f"[!] No se encontró URL de perfil para: {nombre_docente}")
+            return None, None, [], False
+        marcadores = (marcadores_por_perfil or {}).get(url_del_perfil)
+        estadisticas = {}
+        comentarios = extraer_comentarios_con_paginacion(url_del_perfil, cabeceras, marcadores, estadisticas)
+        return url_del_perfil, nombre_docente_real, comentarios, not estadisticas.get('errores')
+
+def recorrer_docentes(nombres_docentes, cabeceras, concurrencia=None, incremental=None):
+    """
+    Procesa varios docentes a la vez en hilos; el límite de peticiones es el mismo para
+    todos. Solo el hilo principal escribe en el almacén, a medida que terminan, y al
+    final exporta comentarios.json. En modo incremental cada perfil se recorre solo
+    hasta los comentarios ya guardados.
+    """
+    concurrencia = concurrencia or int(os.getenv("MISPROFESORES_CONCURRENCIA", MISPROFESORES_CONCURRENCIA))
+    if incremental is None:
+        incremental = os.getenv("MISPROFESORES_INCREMENTAL", "1") != "0"
+    almacen = AlmacenComentarios()
+    estado = cargar_estado_crawl()
+    # Los marcadores solo valen si los comentarios de ese docente siguen guardados
+    guardados = almacen.docentes() if incremental else set()
+    marcadores_por_perfil = {url: entrada['marcadores'] for url, entrada in estado.items()
+                             if entrada.get('docente') in guardados}
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrencia)) as executor:
+            futuros = {executor.submit(procesar_docente, nombre, cabeceras, marcadores_por_perfil): nombre
+                       for nombre in sorted(nombres_docentes)}
+            for futuro in as_completed(futuros):
+                nombre_docente = futuros[futuro]
+                try:
+                    url_del_perfil, nombre_docente_real, comentarios_totales, completo = futuro.result()
+                except Exception as e:
+                    print(f"[ERROR] Falló el docente {nombre_docente}: {e}")
+                    continue
+                if comentarios_totales:
+                    guardar_comentarios(almacen, comentarios_totales, nombre_docente_real)
+                # Con la paginación cortada quedan comentarios nuevos sin leer: no mover los marcadores
+                if completo:
+                    actualizar_estado_perfil(estado, url_del_perfil, nombre_docente_real, comentarios_totales)
+                    guardar_estado_crawl(estado, url_del_perfil)
+    finally:
+        total = almacen.exportar_json()
+        almacen.cerrar()
+        print(f"[+] {total} docentes exportados a {RUTA_EXPORTACION}")
 
 # --- EJECUCIÓN PRINCIPAL DEL SCRIPT ---
 if __name__ == '__main__':
@@ -191,13 +383,4 @@ if __name__ == '__main__':
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
     }
 
-    for nombre_docente in sorted(nombres_docentes):
-        print(f"\n===== Procesando docente: {nombre_docente} =====")
-        url_del_perfil, nombre_docente_real = buscar_url_perfil(nombre_docente, headers)
-
-        if url_del_perfil:
-            comentarios_totales = extraer_comentarios_con_paginacion(url_del_perfil, headers)
-            if comentarios_totales:
-                guardar_en_json_unico(comentarios_totales, nombre_docente_real)
-        else:
-            print(f"[!] No se encontró URL de perfil para: {nombre_docente}")
+    recorrer_docentes(nombres_docentes, headers)
@@ -0,0 +1,264 @@
+import atexit
+import os
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+# Pool de navegadores Chrome ya abiertos. Arrancar Chrome cuesta varios segundos, así
+# que en vez de abrir uno por sesión (o por docente) se prestan instancias calientes:
+# al devolverlas se borran las cookies de todos los dominios y el almacenamiento de cada
+# origen visitado (el pool lo comparten todas las sesiones del proceso, así que nada de
+# un usuario debe llegar al siguiente), se comprueba que sigan vivas y se
+# cierran las que llevan mucho tiempo sin usarse o demasiado tiempo abiertas. Cada
+# préstamo vence por su cuenta (max_prestamo): un navegador pedido para un captcha que
+# nadie contestó vuelve a estar disponible en minutos, no al final de su vida útil.
+
+def _origen(url):
+    """'https://a.com:8443/x?y' -> 'https://a.com:8443'; None para about:blank, data:, etc."""
+    partes = urlsplit(url or "")
+    if partes.scheme in ("http", "https") and partes.netloc:
+        return f"{partes.scheme}://{partes.netloc}"
+    return None
+
+class _Entrada:
+    __slots__ = ('driver', 'creado', 'ultimo_uso', 'vence', 'origenes')
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.creado = self.ultimo_uso = time.monotonic()
+        self.vence = None
+        self.origenes = set()
+        # Se anotan los orígenes que carga driver.get para limpiar su almacenamiento al devolverlo
+        get_original = driver.get
+        def get(url):
+            origen = _origen(url)
+            if origen:
+                self.origenes.add(origen)
+            return get_original(url)
+        driver.get = get
+
+class PoolChrome:
+    def __init__(self, fabrica, tamano=2, max_inactivo=10 * 60, max_vida=30 * 60, nombre="chrome",
+                 max_prestamo=5 * 60):
+        """
+        fabrica: función sin argumentos que crea un driver; tamano: máximo de navegadores
+        abiertos a la vez; max_inactivo: segundos que uno libre puede esperar antes de
+        cerrarse; max_vida: segundos tras los que se recicla; max_prestamo: segundos tras
+        los que un préstamo no renovado se da por abandonado y su navegador se cierra.
+        """
+        self.fabrica = fabrica
+        self.tamano = tamano
+        self.max_inactivo = max_inactivo
+        self.max_vida = max_vida
+        self.max_prestamo = max_prestamo
+        self.nombre = nombre
+        self._libres = []
+        self._prestados = {}
+        self._abriendo = 0
+        self._cond = threading.Condition()
+        self._cerrado = False
+        atexit.register(self.cerrar)
+        threading.Thread(target=self._vigilar, daemon=True).start()
+
+    def _total(self):
+        return len(self._libres) + len(self._prestados) + self._abriendo
+
+    def _cerrar_driver(self, entrada):
+        try:
+            entrada.driver.quit()
+        except Exception as e:
+            print(f"[-] {self.nombre}: error al cerrar navegador: {str(e)}")
+
+    def _vencido(self, entrada, ahora):
+        return ahora - entrada.creado > self.max_vida
+
+    def _sano(self, driver):
+        try:
+            return driver.execute_script("return 1;") == 1
+        except Exception:
+            return False
+
+    def _reiniciar(self, entrada):
+        """
+        Deja el navegador como recién abierto: una pestaña nueva (sin sessionStorage), sin
+        cookies de ningún dominio y sin almacenamiento en los orígenes que visitó. Si algo
+        falla, la excepción sube y devolver() cierra el navegador en vez de reutilizarlo.
+        """
+        driver = entrada.driver
+        if not hasattr(driver, "execute_cdp_cmd"):
+            raise RuntimeError("el navegador no es Chrome/Chromium, no se puede limpiar")
+        anteriores = list(driver.window_handles)
+        for handle in anteriores:
+            driver.switch_to.window(handle)
+            origen = _origen(driver.current_url)
+            if origen:
+                entrada.origenes.add(origen)
+        driver.switch_to.new_window('tab')
+        nueva = driver.current_window_handle
+        for handle in anteriores:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(nueva)
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+        for origen in sorted(entrada.origenes):
+            driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origen, "storageTypes": "all"})
+        entrada.origenes.clear()
+
+    def limpiar(self):
+        """Cierra los libres inactivos o vencidos y libera préstamos abandonados."""
+        ahora = time.monotonic()
+        descartados = []
+        with self._cond:
+            conservar = []
+            for entrada in self._libres:
+                if ahora - entrada.ultimo_uso > self.max_inactivo or self._vencido(entrada, ahora):
+                    descartados.append(entrada)
+                else:
+                    conservar.append(entrada)
+            self._libres = conservar
+            for driver, entrada in list(self._prestados.items()):
+                if ahora > entrada.vence:
+                    print(f"[-] {self.nombre}: préstamo abandonado, se cierra el navegador")
+                    del self._prestados[driver]
+                    descartados.append(entrada)
+            if descartados:
+                self._cond.notify_all()
+        for entrada in descartados:
+            self._cerrar_driver(entrada)
+        return len(descartados)
+
+    def _vigilar(self):
+        while not self._cerrado:
+            time.sleep(max(1, min(self.max_inactivo, self.max_prestamo) / 2))
+            self.limpiar()
+
+    def tomar(self, timeout=120, max_prestamo=None):
+        """
+        Presta un navegador sano; abre uno nuevo si hay cupo o espera a que se libere uno
+        (TimeoutError tras `timeout` segundos). El préstamo vence a los `max_prestamo`
+        segundos (por defecto, los del pool) salvo que se renueve.
+        """
+        limite = time.monotonic() + timeout
+        while True:
+            with self._cond:
+                if self._cerrado:
+                    raise RuntimeError(f"{self.nombre}: el pool está cerrado")
+                entrada = self._libres.pop() if self._libres else None
+                if entrada is None:
+                    if self._total() < self.tamano:
+                        self._abriendo += 1
+                    else:
+                        restante = limite - time.monotonic()
+                        if restante <= 0 or not self._cond.wait(restante):
+                            raise TimeoutError(f"{self.nombre}: no hay navegadores libres")
+                        continue
+            if entrada is None:
+                try:
+                    entrada = _Entrada(self.fabrica())
+                    print(f"[+] {self.nombre}: navegador nuevo abierto")
+                finally:
+                    with self._cond:
+                        self._abriendo -= 1
+                        if entrada is None:
+                            self._cond.notify()
+            elif not self._sano(entrada.driver):
+                print(f"[-] {self.nombre}: navegador sin respuesta, se reemplaza")
+                self._cerrar_driver(entrada)
+                continue
+            with self._cond:
+                entrada.vence = time.monotonic() + (max_prestamo or self.max_prestamo)
+                self._prestados[entrada.driver] = entrada
+            return entrada.driver
+
+    def renovar(self, driver, max_prestamo=None):
+        """Extiende un préstamo en curso; devuelve False si ya venció o no es del pool."""
+        with self._cond:
+            entrada = self._prestados.get(driver)
+            if entrada is None:
+                return False
+            entrada.vence = time.monotonic() + (max_prestamo or self.max_prestamo)
+            return True
+
+    def es_propio(self, driver):
+        """True si el navegador pertenece al pool (prestado o libre)."""
+        with self._cond:
+            return driver in self._prestados or any(e.driver is driver for e in self._libres)
+
+    def devolver(self, driver):
+        """Devuelve un navegador prestado. Devolverlo dos veces no hace nada."""
+        with self._cond:
+            entrada = self._prestados.pop(driver, None)
+        if entrada is None:
+            return
+        conservar = not self._cerrado and not self._vencido(entrada, time.monotonic())
+        if conservar:
+            try:
+                self._reiniciar(entrada)
+            except Exception as e:
+                print(f"[-] {self.nombre}: no se pudo reiniciar el navegador: {str(e)}")
+                conservar = False
+        if conservar:
+            entrada.ultimo_uso = time.monotonic()
+            entrada.vence = None
+        with self._cond:
+            if conservar:
+                self._libres.append(entrada)
+            self._cond.notify()
+        if not conservar:
+            self._cerrar_driver(entrada)
+
+    @contextmanager
+    def prestado(self):
+        """Uso con `with pool.prestado() as driver:`; el navegador vuelve al pool al salir."""
+        driver = self.tomar()
+        try:
+            yield driver
+        finally:
+            self.devolver(driver)
+
+    def calentar(self, cantidad=None, en_segundo_plano=False):
+        """Deja abiertos por adelantado `cantidad` navegadores libres (por defecto, el tamaño)."""
+        def abrir():
+            with self._cond:
+                faltan = min(cantidad or self.tamano, self.tamano - len(self._prestados))
+            drivers = []
+            try:
+                for _ in range(faltan):
+                    drivers.append(self.tomar())
+            except Exception as e:
+                print(f"[-] {self.nombre}: no se pudo calentar el pool: {str(e)}")
+            for driver in drivers:
+                self.devolver(driver)
+        if en_segundo_plano:
+            threading.Thread(target=abrir, daemon=True).start()
+        else:
+            abrir()
+
+    def cerrar(self):
+        with self._cond:
+            self._cerrado = True
+            entradas = self._libres + list(self._prestados.values())
+            self._libres = []
+            self._prestados = {}
+            self._cond.notify_all()
+        for entrada in entradas:
+            self._cerrar_driver(entrada)
+
+_pools = {}
+_lock_pools = threading.Lock()
+
+def pool_global(nombre, fabrica):
+    """Un pool por nombre y por proceso, con tamaño y tiempos tomados del entorno."""
+    with _lock_pools:
+        if nombre not in _pools:
+            _pools[nombre] = PoolChrome(
+                fabrica,
+                tamano=int(os.getenv("CHROME_POOL_TAMANO", "2")),
+                max_inactivo=int(os.getenv("CHROME_POOL_MAX_INACTIVO", 10 * 60)),
+                max_vida=int(os.getenv("CHROME_POOL_MAX_VIDA", 30 * 60)),
+                nombre=nombre,
+                max_prestamo=int(os.getenv("CHROME_POOL_MAX_PRESTAMO", 5 * 60))
+            )
+        return _pools[nombre]
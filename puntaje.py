@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+# Puntaje de un horario: un punto por sesión que empieza entre 7:00 y 12:00 y uno
+# por cada sesión que empieza a 2 horas o menos del fin de la anterior el mismo día
+INICIO_MANANA = 7 * 60
+FIN_MANANA = 12 * 60
+SEPARACION_MAXIMA = 2 * 60
+PUNTAJE_MINIMO = 40
+
+def puntaje_sesiones(sesiones):
+    """Puntaje de un solo horario, dado como lista de (día, inicio, fin) en minutos."""
+    puntaje = sum(1 for _, inicio, _ in sesiones if INICIO_MANANA <= inicio < FIN_MANANA)
+    anterior = None
+    for dia, inicio, fin in sorted(sesiones):
+        if anterior and anterior[0] == dia and 0 <= inicio - anterior[2] <= SEPARACION_MAXIMA:
+            puntaje += 1
+        anterior = (dia, inicio, fin)
+    return puntaje
+
+def _a_minutos(serie):
+    if not pd.api.types.is_datetime64_any_dtype(serie):
+        serie = pd.to_datetime(serie, format="%H:%M")
+    return (serie.dt.hour * 60 + serie.dt.minute).to_numpy(dtype=np.int64)
+
+def calcular_puntajes(df):
+    """
+    Calcula el puntaje total de cada horario de un DataFrame con el formato de
+    horarios_validos.csv (#horario, Día, Hora Inicio, Hora Fin). Todo se hace con
+    arreglos NumPy: se ordena una vez y cada sesión se compara con la anterior.
+    """
+    horario = df["#horario"].to_numpy()
+    dia = pd.factorize(df["Día"])[0]
+    inicio = _a_minutos(df["Hora Inicio"])
+    fin = _a_minutos(df["Hora Fin"])
+
+    orden = np.lexsort((inicio, dia, horario))
+    horario, dia, inicio, fin = horario[orden], dia[orden], inicio[orden], fin[orden]
+
+    puntos = ((inicio >= INICIO_MANANA) & (inicio < FIN_MANANA)).astype(np.int64)
+    separacion = inicio[1:] - fin[:-1]
+    mismo_dia = (horario[1:] == horario[:-1]) & (dia[1:] == dia[:-1])
+    puntos[1:] += mismo_dia & (separacion >= 0) & (separacion <= SEPARACION_MAXIMA)
+
+    ids, posiciones = np.unique(horario, return_inverse=True)
+    totales = np.bincount(posiciones, weights=puntos, minlength=len(ids)).astype(np.int64)
+    return pd.DataFrame({"#horario": ids, "Puntaje Total": totales})
+
+def filtrar_por_puntaje(puntajes, minimo=PUNTAJE_MINIMO):
+    return puntajes[puntajes["Puntaje Total"] > minimo]
+
+def puntuar_csv(ruta_csv, ruta_salida="horarios_puntaje_mayor_40.csv", minimo=PUNTAJE_MINIMO):
+    """Lee horarios_validos.csv y guarda los horarios con puntaje total mayor a `minimo`."""
+    try:
+        try:
+            horarios = pd.read_csv(ruta_csv)
+        except pd.errors.EmptyDataError:
+            horarios = pd.DataFrame(columns=["#horario", "Día", "Hora Inicio", "Hora Fin"])
+        puntajes = calcular_puntajes(horarios)
+        filtrados = filtrar_por_puntaje(puntajes, minimo)
+        filtrados.to_csv(ruta_salida, index=False)
+        print(f"[+] {len(filtrados)} horarios con puntaje mayor a {minimo} guardados en {ruta_salida}")
+        return puntajes
+    except Exception as e:
+        print(f"[-] Error al calcular puntajes: {str(e)}")
+        raise
@@ -0,0 +1,202 @@
+import argparse
+import base64
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from string import Template
+from urllib.parse import parse_qs, quote, quote_plus, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmark_horarios import ESCENARIOS, generar_catalogo
+
+# Servidor local que imita al portal de matrícula y a misprofesores.com con las
+# páginas grabadas de replay/fixtures. Las secciones salen del catálogo sintético de
+# benchmark_horarios y los comentarios se generan con semilla fija, así que dos
+# corridas con los mismos parámetros sirven exactamente lo mismo.
+#
+#   python replay/servidor.py --puerto 8765 --escenario mediano --latencia 0.2
+#
+# Portal:         BASE_URL=http://127.0.0.1:8765/  BASE_HORARIOS=http://127.0.0.1:8765/horarios
+# Detalle HTTP:   DETALLE_CURSOS_URL=http://127.0.0.1:8765/detalle_cursos  DETALLE_CURSOS_PARAMS=p_curso,p_periodo
+# misprofesores:  MISPROFESORES_URL=http://127.0.0.1:8765
+
+CARPETA_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+PERIODO = "202510"
+COOKIE_SESION = "SESION_REPLAY"
+COMENTARIOS_POR_PAGINA = 10
+# PNG de 1x1 píxel: basta para que Selenium pueda tomar la captura del captcha
+CAPTCHA_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII=")
+FRASES = [
+    "Explica muy bien y responde todas las dudas.",
+    "Sus exámenes son difíciles pero justos.",
+    "Llega tarde a clase y no revisa los trabajos.",
+    "Muy buen profesor, lo recomiendo.",
+    "Deja muchas tareas, pero se aprende bastante.",
+    "No explica con claridad, hay que estudiar por cuenta propia.",
+]
+
+_plantillas = {}
+
+def plantilla(nombre):
+    if nombre not in _plantillas:
+        with open(os.path.join(CARPETA_FIXTURES, f"{nombre}.html"), encoding="utf-8") as f:
+            _plantillas[nombre] = Template(f.read())
+    return _plantillas[nombre]
+
+def _slug(nombre):
+    return re.sub(r"[^a-z0-9]+", "-", nombre.lower()).strip("-")
+
+class DatosReplay:
+    """Catálogo de secciones y comentarios que sirve el servidor."""
+
+    def __init__(self, escenario="mediano", semilla=0, max_paginas=3):
+        self.secciones = generar_catalogo(**ESCENARIOS[escenario], semilla=semilla)
+        self.por_curso = {}
+        for sec in self.secciones:
+            self.por_curso.setdefault(sec['curso'], []).append(sec)
+        rnd = random.Random(semilla)
+        self.comentarios = {}
+        for docente in sorted({sec['docente'] for sec in self.secciones}):
+            cantidad = rnd.randint(0, max_paginas * COMENTARIOS_POR_PAGINA)
+            self.comentarios[_slug(docente)] = (docente, [
+                f"{rnd.choice(FRASES)} ({docente.title()}, comentario {i + 1})" for i in range(cantidad)])
+
+    def html_detalle(self, curso_id):
+        bloques = []
+        for sec in self.por_curso.get(curso_id, []):
+            filas = []
+            for i, h in enumerate(sec['horarios'], start=1):
+                inicio = time.strptime(h['hora_inicio'], "%H:%M:%S")
+                fin = time.strptime(h['hora_fin'], "%H:%M:%S")
+                filas.append(plantilla("detalle_fila").substitute(
+                    numero=i, aula=f"A-{100 + i}", dia=h['dia'],
+                    hora=f"{time.strftime('%I:%M %p', inicio)} - {time.strftime('%I:%M %p', fin)}"))
+            bloques.append(plantilla("detalle_bloque").substitute(
+                nrc=sec['nrc'], id_liga=sec['id_liga'], docente=sec['docente'], filas="".join(filas)))
+        return "".join(bloques)
+
+    def html_pregrado(self):
+        cursos = "".join(plantilla("curso_fila").substitute(curso=curso, periodo=PERIODO)
+                         for curso in sorted(self.por_curso))
+        return plantilla("pregrado").substitute(cursos=cursos)
+
+    def html_busqueda(self, base, consulta):
+        tokens = consulta.lower().split()
+        resultados = []
+        for slug, (docente, _) in self.comentarios.items():
+            if sum(1 for token in tokens if token in docente.lower()) >= 2:
+                perfil = f"{base}/profesores/{slug}"
+                resultados.append(plantilla("resultado").substitute(
+                    base=base, perfil=quote(perfil, safe=""), nombre=docente.title()))
+        if not resultados:
+            resultados.append(plantilla("sin_resultados").substitute())
+        return plantilla("buscar").substitute(resultados="".join(resultados))
+
+    def html_perfil(self, slug, pagina):
+        docente, comentarios = self.comentarios[slug]
+        total = max(1, -(-len(comentarios) // COMENTARIOS_POR_PAGINA))
+        desde = (pagina - 1) * COMENTARIOS_POR_PAGINA
+        parrafos = "".join(f'  <p class="commentsParagraph">{c}</p>\n'
+                           for c in comentarios[desde:desde + COMENTARIOS_POR_PAGINA])
+        paginas = "".join(
+            f'  <li class="active"><span>{n}</span></li>\n' if n == pagina else
+            f'  <li><a href="/profesores/{slug}?pag={n}">{n}</a></li>\n'
+            for n in range(1, total + 1))
+        return plantilla("perfil").substitute(nombre=docente.title(), comentarios=parrafos, paginas=paginas)
+
+def crear_manejador(datos, latencia=0.0):
+    class Manejador(BaseHTTPRequestHandler):
+        def log_message(self, formato, *args):
+            pass
+
+        def _responder(self, cuerpo, tipo="text/html; charset=utf-8", estado=200, cabeceras=None):
+            if latencia:
+                time.sleep(latencia)
+            contenido = cuerpo.encode("utf-8") if isinstance(cuerpo, str) else cuerpo
+            self.send_response(estado)
+            self.send_header("Content-Type", tipo)
+            self.send_header("Content-Length", str(len(contenido)))
+            for clave, valor in (cabeceras or {}).items():
+                self.send_header(clave, valor)
+            self.end_headers()
+            self.wfile.write(contenido)
+
+        def _redirigir(self, destino, cabeceras=None):
+            self._responder(b"", estado=302, cabeceras={"Location": destino, **(cabeceras or {})})
+
+        def _con_sesion(self):
+            return f"{COOKIE_SESION}=" in self.headers.get("Cookie", "")
+
+        def _base(self):
+            return f"http://{self.headers.get('Host')}"
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            consulta = parse_qs(url.query)
+            if url.path in ("/", "/login"):
+                self._responder(plantilla("login").substitute())
+            elif url.path == "/captcha.png":
+                self._responder(CAPTCHA_PNG, tipo="image/png")
+            elif url.path == "/inicio":
+                self._responder(plantilla("inicio").substitute())
+            elif url.path.startswith("/horarios"):
+                if not self._con_sesion():
+                    self._redirigir("/login")
+                elif url.path == "/horarios":
+                    self._responder(plantilla("horarios").substitute())
+                elif url.path == "/horarios/pregrado":
+                    self._responder(datos.html_pregrado())
+                else:
+                    self._responder("No encontrado", estado=404)
+            elif url.path == "/Buscar":
+                self._responder(datos.html_busqueda(self._base(), consulta.get("q", [""])[0]))
+            elif url.path.startswith("/profesores/"):
+                slug = url.path.rsplit("/", 1)[-1]
+                if slug not in datos.comentarios:
+                    self._responder("No encontrado", estado=404)
+                else:
+                    self._responder(datos.html_perfil(slug, int(consulta.get("pag", ["1"])[0])))
+            else:
+                self._responder("No encontrado", estado=404)
+
+        def do_POST(self):
+            largo = int(self.headers.get("Content-Length", 0))
+            formulario = parse_qs(self.rfile.read(largo).decode("utf-8"))
+            if self.path == "/login":
+                self._redirigir("/inicio", {"Set-Cookie": f"{COOKIE_SESION}={quote_plus(str(time.time()))}; Path=/"})
+            elif self.path == "/detalle_cursos":
+                if not self._con_sesion():
+                    self._responder("Sesión expirada", estado=401)
+                else:
+                    self._responder(datos.html_detalle(formulario.get("p_curso", [""])[0]))
+            else:
+                self._responder("No encontrado", estado=404)
+
+    return Manejador
+
+def iniciar_servidor(puerto=0, escenario="mediano", latencia=0.0, semilla=0):
+    """Levanta el servidor en un hilo y devuelve (servidor, url_base, datos)."""
+    datos = DatosReplay(escenario, semilla)
+    servidor = ThreadingHTTPServer(("127.0.0.1", puerto), crear_manejador(datos, latencia))
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_port}", datos
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor local con las páginas grabadas del portal")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--escenario", choices=list(ESCENARIOS), default="mediano")
+    parser.add_argument("--latencia", type=float, default=0.0, help="segundos añadidos a cada respuesta")
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args()
+
+    servidor, base, datos = iniciar_servidor(args.puerto, args.escenario, args.latencia, args.semilla)
+    print(f"[+] Servidor de replay en {base} ({len(datos.por_curso)} cursos: {', '.join(sorted(datos.por_curso))})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        servidor.shutdown()
@@ -0,0 +1,84 @@
+import sys
+from datetime import time
+
+
+def minutos_a_hora(minutos):
+    return time(minutos // 60, minutos % 60)
+
+
+class Sesion:
+    """Una sesión semanal de una sección: día y horas como minutos desde las 00:00."""
+    __slots__ = ('dia', 'inicio', 'fin')
+
+    def __init__(self, dia, inicio, fin):
+        self.dia = sys.intern(dia)
+        self.inicio = inicio
+        self.fin = fin
+
+    @property
+    def hora_inicio(self):
+        return minutos_a_hora(self.inicio)
+
+    @property
+    def hora_fin(self):
+        return minutos_a_hora(self.fin)
+
+    def a_dict(self):
+        return {
+            'dia': self.dia,
+            'hora_inicio': str(self.hora_inicio),
+            'hora_fin': str(self.hora_fin)
+        }
+
+    @classmethod
+    def desde_dict(cls, datos):
+        def a_minutos(valor):
+            if isinstance(valor, str):
+                horas, minutos = valor.split(':')[:2]
+                return int(horas) * 60 + int(minutos)
+            return valor.hour * 60 + valor.minute
+        return cls(datos['dia'], a_minutos(datos['hora_inicio']), a_minutos(datos['hora_fin']))
+
+    def __repr__(self):
+        return f"Sesion({self.dia!r}, {self.hora_inicio:%H:%M}-{self.hora_fin:%H:%M})"
+
+
+class Seccion:
+    """
+    Sección de un curso (un NRC) con sus sesiones. Los textos repetidos entre
+    secciones (curso, liga, docente, día) se internan para compartir una sola copia.
+    """
+    __slots__ = ('curso', 'nrc', 'id_liga', 'docente', 'sesiones')
+
+    def __init__(self, curso, nrc, id_liga, docente, sesiones):
+        self.curso = sys.intern(curso)
+        self.nrc = nrc
+        self.id_liga = sys.intern(id_liga)
+        self.docente = sys.intern(docente)
+        self.sesiones = tuple(sesiones)
+
+    @property
+    def tipo(self):
+        return self.id_liga[0]  # T, P, L
+
+    @property
+    def grupo(self):
+        return self.id_liga[1:]  # 1, 2, 3...
+
+    def a_dict(self):
+        """Mismo formato que data-horarios/*.json."""
+        return {
+            'curso': self.curso,
+            'nrc': self.nrc,
+            'id_liga': self.id_liga,
+            'docente': self.docente,
+            'horarios': [sesion.a_dict() for sesion in self.sesiones]
+        }
+
+    @classmethod
+    def desde_dict(cls, datos):
+        return cls(datos['curso'], datos['nrc'], datos['id_liga'], datos['docente'],
+                   [Sesion.desde_dict(h) for h in datos['horarios']])
+
+    def __repr__(self):
+        return f"Seccion({self.curso!r}, {self.id_liga!r}, nrc={self.nrc!r})"